@@ -15,6 +15,10 @@ In this list, the two entries that sum to 2020 are 1721 and 299. Multiplying the
 Of course, your expense report is much larger. Find the two entries that sum to 2020; what do you get if you multiply them together?
 """
 
+from collections import namedtuple
+
+import numpy as np
+
 MAGIC_TOTAL = 2020
 
 def find_answer(numbers):
@@ -51,7 +55,7 @@ def find_triplet(numbers):
 
             term_3 = remainder - term_2
 
-            if numbers_positions.get(term_3):
+            if numbers_positions.get(term_3) not in (None, position_1, position_2):
                 print('pos_1=%r numbers[position_1]=%r remainder=%r' % (position_1, numbers[position_1], remainder))
                 print('-- pos_2=%r term_2=%r term_3=%r in numbers?=%r' % (position_2, term_2, term_3, (numbers_positions.get(term_3))))
                 print('---- %r + %r + %r' % (numbers[position_1], term_2, term_3))
@@ -59,12 +63,161 @@ def find_triplet(numbers):
 
     return None
 
+"""
+General k-sum: every set of k distinct positions whose numbers add up to a target.
+"""
+
+def iter_pair_sums(numbers, target):
+    positions_by_value = {}
+    for position, number in enumerate(numbers):
+        for other_position in positions_by_value.get(target - number, ()):
+            yield (other_position, position)
+        positions_by_value.setdefault(number, []).append(position)
+
+def iter_sorted_k_sums(values, start, k, target):
+    """
+    Index tuples into the sorted list values, drawn from values[start:] in increasing order.
+    k == 2 is a two-pointer sweep; larger k fixes the smallest term and recurses, so k=3 is
+    O(n^2) time with no extra memory beyond the recursion.
+    """
+    if k == 1:
+        for i in range(start, len(values)):
+            if values[i] == target:
+                yield (i,)
+        return
+
+    if k == 2:
+        lo, hi = start, len(values) - 1
+        while lo < hi:
+            pair_sum = values[lo] + values[hi]
+            if pair_sum < target:
+                lo += 1
+            elif pair_sum > target:
+                hi -= 1
+            elif values[lo] == values[hi]:
+                # a run of equal values: every pair within it
+                for i in range(lo, hi + 1):
+                    for j in range(i + 1, hi + 1):
+                        yield (i, j)
+                return
+            else:
+                lo_run_end = lo
+                while values[lo_run_end + 1] == values[lo]:
+                    lo_run_end += 1
+                hi_run_start = hi
+                while values[hi_run_start - 1] == values[hi]:
+                    hi_run_start -= 1
+                for i in range(lo, lo_run_end + 1):
+                    for j in range(hi_run_start, hi + 1):
+                        yield (i, j)
+                lo, hi = lo_run_end + 1, hi_run_start - 1
+        return
+
+    for first in range(start, len(values) - k + 1):
+        if values[first] * k > target:
+            break
+        if values[first] + values[-1] * (k - 1) < target:
+            continue
+        for rest in iter_sorted_k_sums(values, first + 1, k - 1, target - values[first]):
+            yield (first,) + rest
+
+def iter_k_sums(numbers, k, target=MAGIC_TOTAL):
+    """
+    Lazily yields tuples of k distinct positions in numbers whose values sum to target,
+    each set of positions once. Hashing for k == 2, sort + two-pointer for k >= 3.
+    """
+    if k == 2:
+        yield from iter_pair_sums(numbers, target)
+        return
+
+    order = sorted(range(len(numbers)), key=numbers.__getitem__)
+    values = [numbers[position] for position in order]
+    for combo in iter_sorted_k_sums(values, 0, k, target):
+        yield tuple(order[i] for i in combo)
+
+def find_k_sum_product(numbers, k, target=MAGIC_TOTAL):
+    positions = next(iter_k_sums(numbers, k, target), None)
+    if positions is None:
+        return None
+
+    product = 1
+    for position in positions:
+        product *= numbers[position]
+    return product
+
+PairQueryResult = namedtuple('PairQueryResult', ['found', 'first', 'second', 'product'])
+
+class PairSumIndex:
+    """
+    Built once over the numbers: the values sorted as a NumPy array (with the original
+    positions alongside) plus a value -> positions hash. Batches of target totals are
+    answered in one vectorised searchsorted over every complement; single targets can use
+    the hash instead.
+    """
+    MAX_CHUNK_ELEMENTS = 1 << 22
+
+    def __init__(self, numbers):
+        self.numbers = np.asarray(numbers, dtype=np.int64)
+        self.order = np.argsort(self.numbers, kind='stable')
+        self.sorted_values = self.numbers[self.order]
+        self.positions_by_value = {}
+        for position, number in enumerate(numbers):
+            self.positions_by_value.setdefault(number, []).append(position)
+
+    def query_one(self, target):
+        for number, positions in self.positions_by_value.items():
+            other_positions = self.positions_by_value.get(target - number, ())
+            for other_position in other_positions:
+                if other_position != positions[0]:
+                    return (positions[0], other_position)
+        return None
+
+    def query(self, targets):
+        """
+        For each target, the first pair (in sorted order of the first term) of distinct
+        positions summing to it. Returns a PairQueryResult of arrays; where found is False
+        the other entries are 0.
+        """
+        targets = np.asarray(targets, dtype=np.int64)
+        num_values = len(self.sorted_values)
+        found = np.zeros(len(targets), dtype=bool)
+        first = np.zeros(len(targets), dtype=np.int64)
+        second = np.zeros(len(targets), dtype=np.int64)
+        if num_values < 2:
+            return PairQueryResult(found, first, second, np.zeros(len(targets), dtype=np.int64))
+
+        chunk_size = max(1, self.MAX_CHUNK_ELEMENTS // num_values)
+        term_indexes = np.arange(num_values)
+        for start in range(0, len(targets), chunk_size):
+            chunk = targets[start:start + chunk_size]
+            complements = chunk[:, np.newaxis] - self.sorted_values[np.newaxis, :]
+            matches = np.searchsorted(self.sorted_values, complements, side='left')
+            # a term can't be its own complement; step past it to a duplicate if there is one
+            matches[matches == term_indexes] += 1
+            in_range = matches < num_values
+            is_pair = in_range & (self.sorted_values[np.minimum(matches, num_values - 1)] == complements)
+
+            chunk_found = is_pair.any(axis=1)
+            first_terms = np.argmax(is_pair, axis=1)
+            rows = np.arange(len(chunk))
+            found[start:start + len(chunk)] = chunk_found
+            first[start:start + len(chunk)] = np.where(chunk_found, self.order[first_terms], 0)
+            second[start:start + len(chunk)] = np.where(
+                chunk_found, self.order[np.minimum(matches[rows, first_terms], num_values - 1)], 0)
+
+        product = np.where(found, self.numbers[first] * self.numbers[second], 0)
+        return PairQueryResult(found, first, second, product)
 
 def main():
     with open('day01.txt') as f:
         numbers = [int(num.strip()) for num in f.readlines()]
 
     print(find_triplet(numbers))
+    print(find_k_sum_product(numbers, 2))
+    print(find_k_sum_product(numbers, 3))
+
+    index = PairSumIndex(numbers)
+    print(index.query([MAGIC_TOTAL]).product[0])
 
 if __name__ == '__main__':
     main()
@@ -15,8 +15,11 @@ In the above example, 2 passwords are valid. The middle password, cdefg, is not;
 """
 
 import re
+import string
 from collections import namedtuple
 
+import numpy as np
+
 PasswordCheck = namedtuple('PasswordCheck', ['min', 'max', 'check_char', 'password'])
 
 PASSWORD_POLICY_RE = re.compile('(\d+)-(\d+)\s+(\w):\s+(\w+)')
@@ -61,6 +64,152 @@ def validate_password_check_2(check):
 def find_valid_passwords_2(lines):
     return sum([int(validate_password_check_2(parse_line(line))) for line in lines])
 
+"""
+Columnar path: the whole file is parsed with array operations into one row per policy,
+with the passwords left in place in the file buffer and addressed by offset and length.
+"""
+
+PasswordColumns = namedtuple('PasswordColumns', ['min', 'max', 'check_char', 'starts', 'lengths', 'buffer'])
+
+MAX_UINT_DIGITS = 18
+
+# bytes not matching \w in PASSWORD_POLICY_RE
+NON_WORD_BYTES = np.ones(256, dtype=bool)
+NON_WORD_BYTES[[ord(char) for char in string.ascii_letters + string.digits + '_']] = False
+
+def parse_uints(buffer, starts, ends):
+    """
+    Returns (values, is_valid), where a field is valid if it is 1 to MAX_UINT_DIGITS digits.
+    """
+    values = np.zeros(len(starts), dtype=np.int64)
+    widths = ends - starts
+    is_valid = (widths >= 1) & (widths <= MAX_UINT_DIGITS)
+    widths = np.where(is_valid, widths, 0)
+    for digit in range(int(widths.max()) if len(widths) else 0):
+        has_digit = digit < widths
+        digits = buffer[np.where(has_digit, starts + digit, 0)].astype(np.int64) - ord('0')
+        is_valid &= ~has_digit | ((digits >= 0) & (digits <= 9))
+        values = np.where(has_digit, values * 10 + digits, values)
+    return (values, is_valid)
+
+def first_in_line(positions, line_starts, line_ends):
+    """
+    For each line, the first of the sorted positions inside it, and whether there is one.
+    """
+    if len(positions) == 0:
+        return (line_starts, np.zeros(len(line_starts), dtype=bool))
+    first = positions[np.minimum(np.searchsorted(positions, line_starts), len(positions) - 1)]
+    return (first, (first >= line_starts) & (first < line_ends))
+
+def parse_password_columns(data):
+    """
+    Expects every non-blank line to be exactly "<min>-<max> <char>: <password>", with single
+    spaces, \\w characters and an optional trailing \\r. Raises ValueError with the line
+    number of the first line that isn't.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(buffer == ord('\n'))
+    if len(buffer) and buffer[-1] != ord('\n'):
+        line_ends = np.append(line_ends, len(buffer))
+    line_starts = np.concatenate(([0], line_ends + 1))[:len(line_ends)].astype(np.int64)
+
+    # every byte outside the policy's own punctuation and the line ending must be \w; the
+    # sums run from one line start to the next, so they include each line's \n
+    non_word_counts = np.add.reduceat(NON_WORD_BYTES[buffer], line_starts, dtype=np.int32) if len(buffer) else line_starts
+    has_cr = (line_ends > line_starts) & (buffer[np.maximum(line_ends - 1, 0)] == ord('\r'))
+    password_ends = line_ends - has_cr
+    expected_non_word_counts = 4 + has_cr + (line_ends < len(buffer))
+
+    # blank lines (e.g. a trailing one) hold no policy, as with parse_line
+    is_blank = password_ends == line_starts
+    line_nums = np.flatnonzero(~is_blank) + 1
+    line_starts, line_ends, password_ends = line_starts[~is_blank], line_ends[~is_blank], password_ends[~is_blank]
+    non_word_counts, expected_non_word_counts = non_word_counts[~is_blank], expected_non_word_counts[~is_blank]
+
+    def check(is_valid, reason):
+        if not is_valid.all():
+            bad = np.argmin(is_valid)
+            line = buffer[line_starts[bad]:password_ends[bad]].tobytes()
+            raise ValueError('Error parsing password policy on line %r (%r): %s' % (int(line_nums[bad]), line, reason))
+
+    dashes, has_dash = first_in_line(np.flatnonzero(buffer == ord('-')), line_starts, password_ends)
+    colons, has_colon = first_in_line(np.flatnonzero(buffer == ord(':')), line_starts, password_ends)
+    check(has_dash & has_colon, 'expected a "-" and a ":"')
+    check((colons - dashes >= 4) & (password_ends - colons >= 3), 'fields out of place')
+    check((buffer[colons - 2] == ord(' ')) & (buffer[colons + 1] == ord(' ')), 'expected single spaces before the policy character and after the ":"')
+    check(non_word_counts == expected_non_word_counts, 'unexpected non-word characters')
+
+    min_, valid_min = parse_uints(buffer, line_starts, dashes)
+    max_, valid_max = parse_uints(buffer, dashes + 1, colons - 2)
+    check(valid_min & valid_max, 'expected "<min>-<max>" counts')
+
+    starts = colons + 2
+    return PasswordColumns(
+        min=min_,
+        max=max_,
+        check_char=buffer[colons - 1],
+        starts=starts,
+        lengths=password_ends - starts,
+        buffer=buffer,
+    )
+
+def load_password_columns(path):
+    return parse_password_columns(np.fromfile(path, dtype=np.uint8))
+
+def count_check_chars(buffer, starts, lengths, check_chars):
+    """
+    How many times each password contains its policy character, for one block of lines: the
+    password bytes are gathered through int32 offsets into the block's span of the buffer.
+    """
+    counts = np.zeros(len(starts), dtype=np.int32)
+    nonempty = lengths > 0
+    starts, lengths, check_chars = starts[nonempty], lengths[nonempty].astype(np.int32), check_chars[nonempty]
+    if len(starts) == 0:
+        return counts
+
+    span = buffer[starts[0]:starts[-1] + lengths[-1]]
+    local_starts = (starts - starts[0]).astype(np.int32)
+    line_offsets = np.cumsum(lengths, dtype=np.int32) - lengths
+
+    # offsets step by one within a password and jump to the next password's start between them
+    jumps = local_starts.copy()
+    jumps[1:] -= local_starts[:-1] + lengths[:-1] - 1
+    byte_offsets = np.ones(int(line_offsets[-1] + lengths[-1]), dtype=np.int32)
+    byte_offsets[line_offsets] = jumps
+    np.cumsum(byte_offsets, out=byte_offsets)
+
+    is_check_char = span[byte_offsets] == np.repeat(check_chars, lengths)
+    counts[nonempty] = np.add.reduceat(is_check_char, line_offsets, dtype=np.int32)
+    return counts
+
+def count_valid_passwords_columnar(columns, block_bytes=1 << 20):
+    """
+    Returns the number of passwords valid under (policy 1, policy 2). Policy 1 needs every
+    password byte, so it is counted over blocks of whole lines holding about block_bytes
+    password bytes each, which bounds the temporaries at a few bytes per block byte.
+    """
+    if len(columns.starts) == 0:
+        return (0, 0)
+
+    password_ends = np.cumsum(columns.lengths)
+    char_counts = np.zeros(len(columns.starts), dtype=np.int32)
+    block_start = 0
+    while block_start < len(columns.starts):
+        bytes_before = password_ends[block_start - 1] if block_start else 0
+        block_end = max(int(np.searchsorted(password_ends, bytes_before + block_bytes, side='right')), block_start + 1)
+        block = slice(block_start, block_end)
+        char_counts[block] = count_check_chars(columns.buffer, columns.starts[block], columns.lengths[block], columns.check_char[block])
+        block_start = block_end
+    valid_1 = (char_counts >= columns.min) & (char_counts <= columns.max)
+
+    def matches_at(positions):
+        in_password = (positions >= 1) & (positions <= columns.lengths)
+        offsets = np.where(in_password, columns.starts + positions - 1, 0)
+        return in_password & (columns.buffer[offsets] == columns.check_char)
+
+    valid_2 = matches_at(columns.min) ^ matches_at(columns.max)
+    return (int(np.count_nonzero(valid_1)), int(np.count_nonzero(valid_2)))
+
 def main():
     with open('day02.txt') as f:
         lines = f.readlines()
@@ -68,5 +217,7 @@ def main():
     print(find_valid_passwords_1(lines))
     print(find_valid_passwords_2(lines))
 
+    print(count_valid_passwords_columnar(load_password_columns('day02.txt')))
+
 if __name__ == '__main__':
     main()
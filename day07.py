@@ -1,4 +1,8 @@
+import mmap
 import re
+import time
+from array import array
+from collections import namedtuple
 """
 Due to recent aviation regulations, many rules (your puzzle input) are being enforced about bags and their contents; bags must be color-coded and must contain specific quantities of other color-coded bags. 
 
@@ -12,14 +16,15 @@ BAG_CHILDREN_RE = re.compile("(\d+) (.+) bags?")
 def parse_line(line):
     match = LINE_RE.match(line)
     if not match:
-        raise("Error parsing line %s" % line)
+        raise ValueError("Error parsing line %s" % line)
 
     container = match.group(1)
     children_strs = match.group(2).split(", ")
     children = []
     for child in children_strs:
-        if BAG_CHILDREN_RE.match(child):
-            children.append(BAG_CHILDREN_RE.match(child).groups())
+        child_match = BAG_CHILDREN_RE.match(child)
+        if child_match:
+            children.append(child_match.groups())
         elif 'no other bags' in child:
             children.append(None)
 
@@ -99,6 +104,333 @@ def get_bag_content_counts(lines):
         bag_content_counts[container] = new_tuples
     return bag_content_counts
 
+def parse_rule(line):
+    container, children = parse_line(line)
+    return (container, [(int(child[0]), child[1]) for child in children if child])
+
+def build_csr(num_nodes, sources, targets, weights=None):
+    """
+    Packs an edge list into compressed rows: the edges leaving node n are
+    targets[offsets[n]:offsets[n + 1]] (and likewise for weights).
+    """
+    offsets = array('i', [0]) * (num_nodes + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for node in range(num_nodes):
+        offsets[node + 1] += offsets[node]
+
+    packed_targets = array('i', [0]) * len(targets)
+    packed_weights = array('i', [0]) * len(targets) if weights is not None else None
+    fill_positions = array('i', offsets[:num_nodes])
+    for i, source in enumerate(sources):
+        position = fill_positions[source]
+        packed_targets[position] = targets[i]
+        if weights is not None:
+            packed_weights[position] = weights[i]
+        fill_positions[source] += 1
+
+    return (offsets, packed_targets, packed_weights)
+
+class BagGraph:
+    """
+    The rules parsed once into a graph over interned colour ids, with forward (container to
+    contents, with counts) and reverse adjacency in compressed arrays. Contained-bag totals
+    are computed children first and cached per colour. Containing counts are computed per
+    call: one reverse search for a single colour, or a bitset sweep over a topological order
+    for every colour (see containing_colour_counts).
+
+    Rules can be added, replaced or removed afterwards. Edited adjacency is kept in small
+    override dicts on top of the compressed arrays, and only the cached totals the edit can
+    change are dropped: those of the container and its ancestors.
+    """
+    def __init__(self, rules):
+        self.colour_ids = {}
+        self.colours = []
+        self.rule_colour_ids = set()
+        self._contained_bag_totals = []
+        sources, targets, counts = array('i'), array('i'), array('i')
+        for container, children in rules:
+            container_id = self.intern(container)
+            self.rule_colour_ids.add(container_id)
+            for num, child in children:
+                sources.append(container_id)
+                targets.append(self.intern(child))
+                counts.append(num)
+        self._pack(sources, targets, counts)
+
+    @classmethod
+    def from_edges(cls, colours, rule_colour_ids, sources, targets, counts):
+        """
+        Builds the graph straight from interned edge arrays, e.g. from parse_rules_buffer.
+        """
+        graph = cls([])
+        for colour in colours:
+            graph.intern(colour)
+        graph.rule_colour_ids = set(rule_colour_ids)
+        graph._pack(sources, targets, counts)
+        return graph
+
+    def _pack(self, sources, targets, counts):
+        self.num_packed_colours = len(self.colours)
+        self.child_offsets, self.child_ids, self.child_counts = build_csr(self.num_packed_colours, sources, targets, counts)
+        self.parent_offsets, self.parent_ids, _ = build_csr(self.num_packed_colours, targets, sources)
+        self.child_overrides = {}
+        self.parent_overrides = {}
+        # edits reject new cycles, so checking the packed rules once keeps the graph acyclic
+        self.topological_order()
+
+    @classmethod
+    def from_lines(cls, lines):
+        return cls([parse_rule(line) for line in lines])
+
+    def intern(self, colour):
+        if colour not in self.colour_ids:
+            self.colour_ids[colour] = len(self.colours)
+            self.colours.append(colour)
+            self._contained_bag_totals.append(None)
+        return self.colour_ids[colour]
+
+    def children(self, colour_id):
+        if colour_id in self.child_overrides:
+            return self.child_overrides[colour_id]
+        if colour_id >= self.num_packed_colours:
+            return []
+        start, end = self.child_offsets[colour_id], self.child_offsets[colour_id + 1]
+        return list(zip(self.child_counts[start:end], self.child_ids[start:end]))
+
+    def parents(self, colour_id):
+        if colour_id in self.parent_overrides:
+            return self.parent_overrides[colour_id]
+        if colour_id >= self.num_packed_colours:
+            return []
+        return self.parent_ids[self.parent_offsets[colour_id]:self.parent_offsets[colour_id + 1]]
+
+    def topological_order(self):
+        """
+        Colour ids with every container before the bags it contains (Kahn's algorithm).
+        """
+        num_colours = len(self.colours)
+        num_unplaced_parents = array('i', [len(self.parents(i)) for i in range(num_colours)])
+        order = array('i', [i for i in range(num_colours) if num_unplaced_parents[i] == 0])
+        position = 0
+        while position < len(order):
+            for _, child_id in self.children(order[position]):
+                num_unplaced_parents[child_id] -= 1
+                if num_unplaced_parents[child_id] == 0:
+                    order.append(child_id)
+            position += 1
+
+        if len(order) != num_colours:
+            raise ValueError('Bag rules contain a cycle')
+        return order
+
+    def _ancestors(self, colour_id):
+        seen = set()
+        to_visit = [colour_id]
+        while to_visit:
+            for parent_id in self.parents(to_visit.pop()):
+                if parent_id not in seen:
+                    seen.add(parent_id)
+                    to_visit.append(parent_id)
+        return seen
+
+    def contained_bag_total(self, colour_id):
+        """
+        How many bags are inside one bag of this colour; only uncached colours below it are
+        (re)computed, iteratively in post-order.
+        """
+        totals = self._contained_bag_totals
+        to_visit = [colour_id]
+        while to_visit:
+            current = to_visit[-1]
+            if totals[current] is not None:
+                to_visit.pop()
+                continue
+            pending = [child_id for _, child_id in self.children(current) if totals[child_id] is None]
+            if pending:
+                to_visit.extend(pending)
+                continue
+            totals[current] = sum(num * (1 + totals[child_id]) for num, child_id in self.children(current))
+            to_visit.pop()
+        return totals[colour_id]
+
+    def contained_bag_totals(self):
+        """
+        For every colour id, how many bags are inside one bag of that colour.
+        """
+        for colour_id in reversed(self.topological_order()):
+            self.contained_bag_total(colour_id)
+        return list(self._contained_bag_totals)
+
+    def containing_colour_counts(self):
+        """
+        For every colour id, how many colours can eventually contain it. Ancestor sets are
+        bitsets (Python ints) merged down the topological order, so shared ancestors are only
+        counted once. Exact counts for every colour can't be had in O(V + E) in general: this
+        takes O(V * E / wordsize) time and up to O(V^2) bits while it runs, so for a single
+        colour use num_containing_bags instead. Nothing is cached.
+        """
+        ancestor_bits = [0] * len(self.colours)
+        for colour_id in self.topological_order():
+            bits = 0
+            for parent_id in self.parents(colour_id):
+                bits |= ancestor_bits[parent_id] | (1 << parent_id)
+            ancestor_bits[colour_id] = bits
+        return [bin(bits).count('1') for bits in ancestor_bits]
+
+    def num_containing_bags(self, colour):
+        """
+        One search up the reverse adjacency, O(V + E).
+        """
+        if colour not in self.colour_ids:
+            return 0
+        return len(self._ancestors(self.colour_ids[colour]))
+
+    def num_contained_bags(self, colour):
+        if colour not in self.colour_ids:
+            return 0
+        return self.contained_bag_total(self.colour_ids[colour])
+
+    def _set_children(self, container_id, new_children):
+        old_children = self.children(container_id)
+        new_child_ids = set(child_id for _, child_id in new_children)
+        ancestor_ids = self._ancestors(container_id)
+        for child_id in new_child_ids:
+            if child_id == container_id or child_id in ancestor_ids:
+                raise ValueError('Rule for %r would create a cycle through %r' % (
+                    self.colours[container_id], self.colours[child_id]))
+
+        for colour_id in [container_id] + list(ancestor_ids):
+            self._contained_bag_totals[colour_id] = None
+
+        old_child_ids = set(child_id for _, child_id in old_children)
+        for child_id in old_child_ids - new_child_ids:
+            self.parent_overrides[child_id] = [p for p in self.parents(child_id) if p != container_id]
+        for child_id in new_child_ids - old_child_ids:
+            self.parent_overrides[child_id] = list(self.parents(child_id)) + [container_id]
+        self.child_overrides[container_id] = list(new_children)
+
+    def add_rule(self, container, children):
+        """
+        children is a list of (num, colour) pairs, as in get_bag_content_counts.
+        """
+        container_id = self.intern(container)
+        if container_id in self.rule_colour_ids:
+            raise ValueError('There is already a rule for %r' % container)
+        self._set_children(container_id, [(num, self.intern(child)) for num, child in children])
+        self.rule_colour_ids.add(container_id)
+
+    def replace_rule(self, container, children):
+        container_id = self.intern(container)
+        self._set_children(container_id, [(num, self.intern(child)) for num, child in children])
+        self.rule_colour_ids.add(container_id)
+
+    def remove_rule(self, container):
+        if container not in self.colour_ids:
+            return
+        container_id = self.colour_ids[container]
+        self._set_children(container_id, [])
+        self.rule_colour_ids.discard(container_id)
+
+    def update_line(self, line):
+        container, children = parse_rule(line)
+        self.replace_rule(container, children)
+
+"""
+Bulk parsing: the whole rules file is tokenised by one combined regex, with a small state
+machine checking that the tokens of each line come in the right order.
+"""
+
+RULE_TOKEN_RE = re.compile(rb"""
+    (?P<child>(?P<num>\d+)\ (?P<child_colour>[^\n,.]+?)\ bags?(?P<separator>,\ |\.))
+    |(?P<empty>no\ other\ bags\.)
+    |(?P<container>(?P<container_colour>[^\n,.]+?)\ bags\ contain\ )
+    |(?P<unterminated>\d+\ [^\n,.]+?\ bags?|no\ other\ bags)
+    |(?P<newline>\r?\n)
+    |(?P<other>.)
+""", re.VERBOSE)
+
+EXPECT_CONTAINER = 0
+EXPECT_FIRST_CHILD = 1
+EXPECT_NEXT_CHILD = 2
+EXPECT_LINE_END = 3
+
+ParsedRules = namedtuple('ParsedRules', ['colours', 'rule_colour_ids', 'sources', 'targets', 'counts'])
+
+def parse_rules_buffer(buf):
+    """
+    Parses a bytes-like buffer of rules straight into interned colour ids and edge arrays.
+    Raises ValueError with the line and column on the first malformed line.
+    """
+    colour_ids = {}
+    rule_colour_ids = array('i')
+    sources, targets, counts = array('i'), array('i'), array('i')
+
+    def intern(colour):
+        if colour not in colour_ids:
+            colour_ids[colour] = len(colour_ids)
+        return colour_ids[colour]
+
+    def error(match, reason):
+        raise ValueError('Error parsing rules on line %r, column %r at %r: %s' % (
+            line_num, match.start() - line_start + 1, match.group(0), reason))
+
+    line_num = 1
+    line_start = 0
+    expecting = EXPECT_CONTAINER
+    container_id = None
+    for match in RULE_TOKEN_RE.finditer(buf):
+        kind = match.lastgroup
+        if kind == 'child':
+            if expecting not in (EXPECT_FIRST_CHILD, EXPECT_NEXT_CHILD):
+                error(match, 'unexpected bag count')
+            sources.append(container_id)
+            targets.append(intern(match.group('child_colour')))
+            counts.append(int(match.group('num')))
+            expecting = EXPECT_NEXT_CHILD if match.group('separator') == b', ' else EXPECT_LINE_END
+        elif kind == 'empty':
+            if expecting != EXPECT_FIRST_CHILD:
+                error(match, 'unexpected "no other bags"')
+            expecting = EXPECT_LINE_END
+        elif kind == 'unterminated':
+            if expecting not in (EXPECT_FIRST_CHILD, EXPECT_NEXT_CHILD):
+                error(match, 'unexpected bag count')
+            error(match, 'missing ", " or "." after it')
+        elif kind == 'container':
+            if expecting != EXPECT_CONTAINER:
+                error(match, 'unexpected container')
+            container_id = intern(match.group('container_colour'))
+            rule_colour_ids.append(container_id)
+            expecting = EXPECT_FIRST_CHILD
+        elif kind == 'newline':
+            if expecting not in (EXPECT_CONTAINER, EXPECT_LINE_END):
+                error(match, 'line ends before the rule does')
+            line_num += 1
+            line_start = match.end()
+            expecting = EXPECT_CONTAINER
+        else:
+            error(match, 'unexpected character')
+
+    if expecting not in (EXPECT_CONTAINER, EXPECT_LINE_END):
+        raise ValueError('Error parsing rules on line %r, column %r: file ends before the rule does' % (
+            line_num, len(buf) - line_start + 1))
+
+    colours = [colour.decode('ascii') for colour in colour_ids]
+    return ParsedRules(colours, rule_colour_ids, sources, targets, counts)
+
+def parse_rules_file(path):
+    """
+    Memory-maps the rules file, parses it in one pass and reports the parse throughput.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        start_time = time.perf_counter()
+        parsed = parse_rules_buffer(buf)
+        elapsed = time.perf_counter() - start_time
+        num_bytes = len(buf)
+
+    print('parsed %r bytes in %.3fs (%.1f MB/s)' % (num_bytes, elapsed, num_bytes / 1e6 / max(elapsed, 1e-9)))
+    return BagGraph.from_edges(*parsed)
+
 def main():
     with open('day07.txt') as f:
         lines = [line.strip() for line in f.readlines()]
@@ -111,5 +443,9 @@ def main():
     result = get_num_contained_bags(lines, variety)
     print(result)
 
+    bag_graph = parse_rules_file('day07.txt')
+    print(bag_graph.num_containing_bags(variety))
+    print(bag_graph.num_contained_bags(variety))
+
 if __name__ == '__main__':
     main()
@@ -9,7 +9,8 @@ Run your copy of the boot code. Immediately before any instruction is executed a
 
 """
 import copy
-from collections import OrderedDict
+from array import array
+from collections import Counter, OrderedDict, deque, namedtuple
 
 def run_program_and_return_acc_before_loop(lines):
     acc = 0
@@ -41,6 +42,236 @@ def run_program_and_return_acc_before_loop(lines):
 
     return (lines_executed, acc, False)
 
+OP_NOP = 0
+OP_ACC = 1
+OP_JMP = 2
+
+OPCODES = {
+    'nop': OP_NOP,
+    'acc': OP_ACC,
+    'jmp': OP_JMP,
+}
+
+class CompiledProgram:
+    """
+    The program parsed once into parallel arrays of opcodes and operands, so it can be run
+    any number of times without touching the source text again.
+    """
+    def __init__(self, opcodes, operands):
+        self.opcodes = opcodes
+        self.operands = operands
+
+    @classmethod
+    def from_lines(cls, lines):
+        opcodes = array('b')
+        operands = array('i')
+        for line_num, line in enumerate(lines):
+            cmd, arg = line.split()
+            if cmd not in OPCODES:
+                raise ValueError('Unknown instruction %r on line %r' % (cmd, line_num))
+            opcodes.append(OPCODES[cmd])
+            operands.append(int(arg))
+        return cls(opcodes=opcodes, operands=operands)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def run(self, tracer=None):
+        """
+        Same result as run_program_and_return_acc_before_loop, except that the executed lines
+        come back as a bytearray with a 1 for every line that ran. Passing a tracer switches to
+        a separate instrumented loop, so untraced runs pay nothing for tracing.
+        """
+        if tracer is not None:
+            return self._run_traced(tracer)
+
+        opcodes, operands = self.opcodes, self.operands
+        num_instructions = len(opcodes)
+        visited = bytearray(num_instructions)
+        acc = 0
+        pc = 0
+        while pc < num_instructions:
+            if visited[pc]:
+                return (visited, acc, False)
+            visited[pc] = 1
+
+            op = opcodes[pc]
+            if op == OP_ACC:
+                acc += operands[pc]
+                pc += 1
+            elif op == OP_JMP:
+                pc += operands[pc]
+                if pc < 0:
+                    raise ValueError('Jumped to line %r before the start of the program' % pc)
+            else:
+                pc += 1
+
+        return (visited, acc, True)
+
+    def _run_traced(self, tracer):
+        opcodes, operands = self.opcodes, self.operands
+        num_instructions = len(opcodes)
+        visited = bytearray(num_instructions)
+        acc = 0
+        pc = 0
+        tracer.on_start(self)
+        while pc < num_instructions:
+            if visited[pc]:
+                tracer.on_loop(pc, acc)
+                tracer.on_finish(acc, False)
+                return (visited, acc, False)
+            visited[pc] = 1
+
+            op = opcodes[pc]
+            tracer.on_step(pc, op, operands[pc], acc)
+            if op == OP_ACC:
+                acc += operands[pc]
+                pc += 1
+            elif op == OP_JMP:
+                pc += operands[pc]
+                if pc < 0:
+                    raise ValueError('Jumped to line %r before the start of the program' % pc)
+            else:
+                pc += 1
+
+        tracer.on_finish(acc, True)
+        return (visited, acc, True)
+
+    def next_line(self, line_num, flip=False):
+        op = self.opcodes[line_num]
+        if op == OP_ACC:
+            return line_num + 1
+        if (op == OP_JMP) != flip:
+            return line_num + self.operands[line_num]
+        return line_num + 1
+
+    def lines_reaching_end(self):
+        """
+        Marks every line from which the unmodified program terminates, by walking the
+        control flow graph backwards from the lines that step past the end.
+        """
+        num_instructions = len(self)
+        next_lines = array('i', [self.next_line(line_num) for line_num in range(num_instructions)])
+
+        # predecessors of line j are predecessors[offsets[j]:offsets[j + 1]]
+        offsets = array('i', [0]) * (num_instructions + 1)
+        for next_line in next_lines:
+            if 0 <= next_line < num_instructions:
+                offsets[next_line + 1] += 1
+        for line_num in range(num_instructions):
+            offsets[line_num + 1] += offsets[line_num]
+
+        predecessors = array('i', [0]) * offsets[num_instructions]
+        fill_positions = array('i', offsets[:num_instructions])
+        for line_num, next_line in enumerate(next_lines):
+            if 0 <= next_line < num_instructions:
+                predecessors[fill_positions[next_line]] = line_num
+                fill_positions[next_line] += 1
+
+        reaches_end = bytearray(num_instructions)
+        to_visit = [line_num for line_num, next_line in enumerate(next_lines) if next_line >= num_instructions]
+        for line_num in to_visit:
+            reaches_end[line_num] = 1
+        while to_visit:
+            line_num = to_visit.pop()
+            for predecessor in predecessors[offsets[line_num]:offsets[line_num + 1]]:
+                if not reaches_end[predecessor]:
+                    reaches_end[predecessor] = 1
+                    to_visit.append(predecessor)
+
+        return reaches_end
+
+    def repair(self):
+        """
+        Finds the single jmp/nop flip that makes the program terminate, in one forward walk:
+        the first executed jmp/nop whose flipped target is known to reach the end is the fix.
+        Returns (acc, patched_line_num), with patched_line_num None if the program already
+        terminates, or None if no single flip helps.
+        """
+        opcodes, operands = self.opcodes, self.operands
+        num_instructions = len(opcodes)
+        reaches_end = self.lines_reaching_end()
+        if num_instructions == 0 or reaches_end[0]:
+            _, acc, _ = self.run()
+            return (acc, None)
+
+        visited = bytearray(num_instructions)
+        patched_line_num = None
+        acc = 0
+        pc = 0
+        while pc < num_instructions:
+            if pc < 0 or visited[pc]:
+                return None
+            visited[pc] = 1
+
+            if patched_line_num is None and opcodes[pc] != OP_ACC:
+                flipped_next_line = self.next_line(pc, flip=True)
+                if flipped_next_line >= num_instructions or (flipped_next_line >= 0 and reaches_end[flipped_next_line]):
+                    patched_line_num = pc
+                    pc = flipped_next_line
+                    continue
+
+            if opcodes[pc] == OP_ACC:
+                acc += operands[pc]
+            pc = self.next_line(pc)
+
+        return (acc, patched_line_num)
+
+class Tracer:
+    """
+    Hooks called by CompiledProgram.run(tracer=...). Subclasses override what they need.
+    on_step sees each instruction before it executes, with the accumulator at that point;
+    on_loop is called with the line that was about to run a second time.
+    """
+    def on_start(self, program):
+        pass
+
+    def on_step(self, pc, opcode, operand, acc):
+        pass
+
+    def on_loop(self, pc, acc):
+        pass
+
+    def on_finish(self, acc, terminated):
+        pass
+
+OPCODE_NAMES = {opcode: cmd for cmd, opcode in OPCODES.items()}
+
+Step = namedtuple('Step', ['line_num', 'cmd', 'arg', 'acc'])
+
+class ProfilingTracer(Tracer):
+    """
+    Counts executed instructions per opcode and per line, records where runs entered an
+    infinite loop and optionally keeps the last history_size steps. Counts accumulate over
+    every run the tracer is attached to; a single run executes each line at most once, so the
+    per-line histogram is most useful across many runs (e.g. all candidate repairs).
+    """
+    def __init__(self, history_size=None):
+        self.opcode_counts = Counter()
+        self.line_counts = Counter()
+        self.loop_entries = Counter()
+        self.num_runs = 0
+        self.num_terminated = 0
+        self.history = deque(maxlen=history_size) if history_size else None
+
+    def on_start(self, program):
+        self.num_runs += 1
+
+    def on_step(self, pc, opcode, operand, acc):
+        self.opcode_counts[OPCODE_NAMES[opcode]] += 1
+        self.line_counts[pc] += 1
+        if self.history is not None:
+            self.history.append(Step(line_num=pc, cmd=OPCODE_NAMES[opcode], arg=operand, acc=acc))
+
+    def on_loop(self, pc, acc):
+        self.loop_entries[pc] += 1
+
+    def on_finish(self, acc, terminated):
+        self.num_terminated += int(terminated)
+
+    def hot_lines(self, num_lines=10):
+        return self.line_counts.most_common(num_lines)
+
 """
 Fix the program so that it terminates normally by changing exactly one jmp (to nop) or nop (to jmp). What is the value of the accumulator after the program terminates?
 """
@@ -75,9 +306,16 @@ def main():
     lines_executed, acc, result = run_program_and_return_acc_before_loop(lines)
     print(acc)
 
+    program = CompiledProgram.from_lines(lines)
+    visited, acc, terminated = program.run()
+    print(acc)
+
     acc = find_acc_after_corrected_program(lines, lines_executed)
     print(acc)
 
+    acc, patched_line_num = program.repair()
+    print(acc, patched_line_num)
+
 
 if __name__ == '__main__':
     main()
@@ -4,6 +4,9 @@ XMAS starts by transmitting a preamble of 25 numbers. After that, each number yo
 The first step of attacking the weakness in the XMAS data is to find the first number in the list (after the preamble) which is not the sum of two of the 25 numbers before it. What is the first number that does not have this property?
 
 """
+from collections import Counter, deque, namedtuple
+
+import numpy as np
 
 def compute_sums_for_subarray(subarray, memoized_sums = {}):
     sums = set()
@@ -35,6 +38,34 @@ def find_first_violation(lines, preamble_length):
             return (lines[check_pos], check_pos)
         check_pos += 1
 
+def iter_violations(numbers, preamble_length):
+    """
+    Yields (number, position) for every number that is not the sum of two of the
+    preamble_length numbers before it. Works on any iterable, including unbounded streams:
+    the pair sums of the current window are kept as a multiset and updated as one number
+    leaves and one enters, so each step is O(preamble_length) and memory stays O(k^2).
+    """
+    window = deque()
+    pair_sums = Counter()
+    for position, number in enumerate(numbers):
+        if len(window) == preamble_length:
+            if pair_sums[number] == 0:
+                yield (number, position)
+
+            oldest = window.popleft()
+            for other in window:
+                pair_sum = oldest + other
+                pair_sums[pair_sum] -= 1
+                if pair_sums[pair_sum] == 0:
+                    del pair_sums[pair_sum]
+
+        for other in window:
+            pair_sums[number + other] += 1
+        window.append(number)
+
+def find_first_violation_streaming(numbers, preamble_length):
+    return next(iter_violations(numbers, preamble_length), None)
+
 
 """
 The final step in breaking the XMAS encryption relies on the invalid number you just found: you must find a contiguous set of at least two numbers in your list which sum to the invalid number from step 1.
@@ -59,6 +90,96 @@ def find_range_for_violation(lines, violation_result, violation_pos):
         if current_sum == violation_result:
             return (range_start_pos + 1, range_end_pos)
 
+RangeResult = namedtuple('RangeResult', ['start', 'end', 'least', 'greatest', 'weakness'])
+
+def iter_numbers(numbers, chunk_size=1 << 16):
+    """
+    Yields the numbers as Python ints, slicing NumPy arrays (e.g. memmaps) a chunk at a time
+    so that elements aren't read out one NumPy scalar at a time.
+    """
+    for chunk_start in range(0, len(numbers), chunk_size):
+        chunk = numbers[chunk_start:chunk_start + chunk_size]
+        yield from (chunk.tolist() if isinstance(chunk, np.ndarray) else chunk)
+
+def find_range_summing_to(numbers, target):
+    """
+    Two-pointer search for the first contiguous run of at least two numbers summing to target,
+    assuming non-negative numbers (as XMAS numbers are). The window's min and max are kept in
+    monotonic deques, so range, min and max all come out of one pass. numbers can be any
+    sequence, e.g. a np.memmap from load_numbers_memmap; both pointers read it through
+    iter_numbers. end is inclusive.
+    """
+    leaving_numbers = iter_numbers(numbers)
+    start = 0
+    window_sum = 0
+    # (position, number) pairs
+    window_mins = deque()
+    window_maxes = deque()
+    for end, number in enumerate(iter_numbers(numbers)):
+        window_sum += number
+        while window_mins and window_mins[-1][1] >= number:
+            window_mins.pop()
+        window_mins.append((end, number))
+        while window_maxes and window_maxes[-1][1] <= number:
+            window_maxes.pop()
+        window_maxes.append((end, number))
+
+        while window_sum > target and start < end:
+            window_sum -= next(leaving_numbers)
+            start += 1
+            if window_mins[0][0] < start:
+                window_mins.popleft()
+            if window_maxes[0][0] < start:
+                window_maxes.popleft()
+
+        if window_sum == target and end > start:
+            least, greatest = window_mins[0][1], window_maxes[0][1]
+            return RangeResult(start, end, least, greatest, least + greatest)
+
+    return None
+
+def load_numbers_memmap(path):
+    """
+    Maps a file of raw little-endian int64 values without reading it into memory.
+    """
+    return np.memmap(path, dtype='<i8', mode='r')
+
+class PrefixSumIndex:
+    """
+    Prefix sums over a fixed array of non-negative numbers, for answering many targets:
+    a range [i, j] sums to target exactly when prefix[j + 1] - prefix[i] == target, and since
+    the prefix sums never decrease the matching i for every end is one searchsorted away.
+    Pass prefix_path to keep the prefix sums in a memory-mapped file as well.
+    """
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, numbers, prefix_path=None):
+        self.numbers = np.asarray(numbers)
+        if prefix_path:
+            self.prefix = np.memmap(prefix_path, dtype=np.int64, mode='w+', shape=(len(numbers) + 1,))
+        else:
+            self.prefix = np.empty(len(numbers) + 1, dtype=np.int64)
+        self.prefix[0] = 0
+        np.cumsum(numbers, dtype=np.int64, out=self.prefix[1:])
+
+    def find_range(self, target):
+        for chunk_start in range(2, len(self.prefix), self.CHUNK_SIZE):
+            ends = np.arange(chunk_start, min(chunk_start + self.CHUNK_SIZE, len(self.prefix)))
+            wanted = self.prefix[ends] - target
+            starts = np.searchsorted(self.prefix, wanted, side='left')
+            found = (starts <= ends - 2) & (self.prefix[np.minimum(starts, len(self.prefix) - 1)] == wanted)
+            if found.any():
+                first = np.argmax(found)
+                start, end = int(starts[first]), int(ends[first]) - 1
+                subrange = self.numbers[start:end + 1]
+                least, greatest = int(subrange.min()), int(subrange.max())
+                return RangeResult(start, end, least, greatest, least + greatest)
+
+        return None
+
+    def find_ranges(self, targets):
+        return [self.find_range(target) for target in targets]
+
 
 def main():
     with open('day09.txt') as f:
@@ -76,6 +197,9 @@ def main():
 
     print(least + greatest)
 
+    result = find_range_summing_to(lines, violation_result)
+    print(result.weakness)
+
 
 if __name__ == '__main__':
     main()
@@ -9,6 +9,9 @@ If you use every adapter in your bag at once, what is the distribution of joltag
 
 Find a chain that uses all of your adapters to connect the charging outlet to your device's built-in adapter and count the joltage differences between the charging outlet, the adapters, and your device. What is the number of 1-jolt differences multiplied by the number of 3-jolt differences?
 """
+from collections import deque
+
+import numpy as np
 
 def find_differences(lines):
     sorted_lines = [0] + sorted(lines)
@@ -26,6 +29,34 @@ def find_differences(lines):
     diffs[3] += 1
     return diffs
 
+class JoltageChain:
+    """
+    The outlet plus the adapters in order, sorted once with a counting sort (joltages are
+    small non-negative integers), shared by the difference histogram and the run
+    decomposition.
+    """
+    def __init__(self, joltages, device_gap=3):
+        counts = np.bincount(np.asarray(joltages, dtype=np.int64))
+        self.chain = np.zeros(int(counts.sum()) + 1, dtype=np.int64)
+        self.chain[1:] = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+        self.gaps = np.diff(self.chain)
+        self.device_gap = device_gap
+
+    def differences(self):
+        """
+        Count of every gap size in the chain, including the gap up to the device.
+        """
+        gap_counts = np.bincount(self.gaps)
+        diffs = {gap: int(count) for gap, count in enumerate(gap_counts) if count}
+        diffs[self.device_gap] = diffs.get(self.device_gap, 0) + 1
+        return diffs
+
+    def runs(self):
+        """
+        The chain split into runs of joltages 1 apart, as views into the sorted chain.
+        """
+        return np.split(self.chain, np.flatnonzero(self.gaps != 1) + 1)
+
 """
 To completely determine whether you have enough adapters, you'll need to figure out how many different ways they can be arranged. Every arrangement needs to connect the charging outlet to your device. The previous rules about when adapters can successfully connect still apply.
 
@@ -69,6 +100,43 @@ def find_num_paths(lines):
         product *= find_num_paths_in_subarray(subarray)
     return product
 
+def count_arrangements(joltages, min_gap=1, max_gap=3, modulus=None):
+    """
+    Number of ways to chain the outlet (0) to the device through a subset of the adapters,
+    where each step up is between min_gap and max_gap jolts. Walks the sorted adapters once,
+    keeping a running total of the ways to reach the adapters that are in range of the
+    current one. The device sits max_gap above the highest adapter, so only copies of the
+    highest adapter can reach it and the answer is the sum of their counts; when that is
+    0 jolts the outlet is one of them. With modulus set, counts are reduced as they go.
+    """
+    too_close = deque([(0, 1)])
+    in_range = deque()
+    in_range_ways = 0
+    # the outlet counts as a 0-jolt copy of the highest adapter
+    highest_joltage = 0
+    highest_ways = 1
+    for joltage in sorted(joltages):
+        while too_close and joltage - too_close[0][0] >= min_gap:
+            entry = too_close.popleft()
+            in_range.append(entry)
+            in_range_ways += entry[1]
+        while in_range and joltage - in_range[0][0] > max_gap:
+            in_range_ways -= in_range.popleft()[1]
+
+        ways = in_range_ways
+        if modulus:
+            ways %= modulus
+            in_range_ways %= modulus
+        too_close.append((joltage, ways))
+
+        if joltage != highest_joltage:
+            highest_joltage, highest_ways = joltage, 0
+        highest_ways += ways
+        if modulus:
+            highest_ways %= modulus
+
+    return highest_ways
+
 def main():
     with open('day10.txt') as f:
         lines = [int(line.strip()) for line in f.readlines()]
@@ -77,8 +145,15 @@ def main():
     print(diffs)
     print(diffs[1] * diffs[3])
 
+    chain = JoltageChain(lines)
+    diffs = chain.differences()
+    print(diffs.get(1, 0) * diffs.get(3, 0))
+
     result = find_num_paths(lines)
     print(result)
 
+    result = count_arrangements(lines)
+    print(result)
+
 if __name__ == '__main__':
     main()
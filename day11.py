@@ -9,7 +9,31 @@ Floor (.) never changes; seats don't move, and nobody sits on the floor.
 
 Simulate your seating area by applying the seating rules repeatedly until no seats change state. How many seats end up occupied?
 """
+import mmap
+import os
+from collections import deque, namedtuple
 from enum import Enum
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+ADJACENT_OFFSETS = [
+    (-1, -1), (-1, 0), (-1, 1),
+    (0, -1), (0, 1),
+    (1, -1), (1, 0), (1, 1),
+]
+
+# An empty seat becomes occupied when at most occupy_max of its neighbours are occupied;
+# an occupied seat is vacated when at least leave_min of its neighbours are occupied.
+SeatingRules = namedtuple('SeatingRules', ['occupy_max', 'leave_min'])
+
+DEFAULT_RULES = {
+    'ADJACENT': SeatingRules(occupy_max=0, leave_min=4),
+    'VISIBLE': SeatingRules(occupy_max=0, leave_min=5),
+}
+
+def next_occupied(was_occupied, counts, rules):
+    return np.where(was_occupied, counts < rules.leave_min, counts <= rules.occupy_max)
 
 class CellType(Enum):
     FLOOR = 1
@@ -84,11 +108,101 @@ class Cell:
         return self.type == other_cell.type and self.state == other_cell.state
 
 
+def nearest_seat_ids_towards(seat_ids, d_row, d_col):
+    """
+    For every position, the id of the first seat seen when looking in direction (d_row, d_col),
+    or -1 if the ray leaves the grid first. Each row is derived from the row before it, so
+    a direction costs one vectorised pass over the grid.
+    """
+    if d_row == 0:
+        return nearest_seat_ids_towards(seat_ids.T, d_col, d_row).T
+
+    height = seat_ids.shape[0]
+    nearest = np.full(seat_ids.shape, -1, dtype=np.int32)
+    rows = range(height - 2, -1, -1) if d_row > 0 else range(1, height)
+    for row in rows:
+        source_row = row + d_row
+        seen = np.where(seat_ids[source_row] >= 0, seat_ids[source_row], nearest[source_row])
+        if d_col > 0:
+            nearest[row, :-d_col] = seen[d_col:]
+        elif d_col < 0:
+            nearest[row, -d_col:] = seen[:d_col]
+        else:
+            nearest[row] = seen
+
+    return nearest
+
+def adjacent_seat_ids_towards(seat_ids, d_row, d_col):
+    height, width = seat_ids.shape
+    padded = np.pad(seat_ids, 1, constant_values=-1)
+    return padded[1 + d_row:1 + d_row + height, 1 + d_col:1 + d_col + width]
+
+def num_occupied_adjacent(padded_occupied):
+    """
+    Neighbour counts for the interior of an occupied mask that has one row/column of
+    padding (or halo) on every side.
+    """
+    height, width = padded_occupied.shape[0] - 2, padded_occupied.shape[1] - 2
+    padded = padded_occupied.astype(np.uint8)
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for d_row, d_col in ADJACENT_OFFSETS:
+        counts += padded[1 + d_row:1 + d_row + height, 1 + d_col:1 + d_col + width]
+    return counts
+
+SEAT_LOOKUPS = {
+    'ADJACENT': adjacent_seat_ids_towards,
+    'VISIBLE': nearest_seat_ids_towards,
+}
+
+class SeatIndex:
+    """
+    Seats never move, so the seats visible from (or adjacent to) each seat only need to be
+    found once per grid. Seats are numbered in row-major order; neighbours[seat_id] holds up
+    to 8 neighbouring seat ids, padded with -1.
+    """
+    def __init__(self, seat_ids, seat_coords, neighbours):
+        self.seat_ids = seat_ids
+        self.seat_coords = seat_coords
+        self.neighbours = neighbours
+
+    @classmethod
+    def visible_from_seat_mask(cls, seat_mask):
+        return cls.from_seat_mask(seat_mask, 'VISIBLE')
+
+    @classmethod
+    def from_seat_mask(cls, seat_mask, lookup_version):
+        seat_ids_towards = SEAT_LOOKUPS[lookup_version]
+        num_seats = int(np.count_nonzero(seat_mask))
+        seat_ids = np.full(seat_mask.shape, -1, dtype=np.int32)
+        seat_ids[seat_mask] = np.arange(num_seats, dtype=np.int32)
+        seat_coords = np.argwhere(seat_mask).astype(np.int32)
+
+        neighbours = np.empty((num_seats, len(ADJACENT_OFFSETS)), dtype=np.int32)
+        for i, (d_row, d_col) in enumerate(ADJACENT_OFFSETS):
+            neighbours[:, i] = seat_ids_towards(seat_ids, d_row, d_col)[seat_mask]
+
+        return cls(seat_ids=seat_ids, seat_coords=seat_coords, neighbours=neighbours)
+
+    @property
+    def num_seats(self):
+        return len(self.seat_coords)
+
+    def neighbour_coords(self, row_col_tuple):
+        seat_neighbours = self.neighbours[self.seat_ids[row_col_tuple]]
+        return self.seat_coords[seat_neighbours[seat_neighbours >= 0]].tolist()
+
+    def num_occupied_neighbours(self, occupied_by_seat, seat_ids=None):
+        # occupied_by_seat carries a trailing False so that -1 (no neighbour) reads as empty
+        neighbours = self.neighbours if seat_ids is None else self.neighbours[seat_ids]
+        return np.count_nonzero(occupied_by_seat[neighbours], axis=1)
+
+
 class Grid:
-    def __init__(self, cell_rows):
+    def __init__(self, cell_rows, visible_seat_index=None):
         self.cell_rows = cell_rows
         self.width = len(cell_rows[0])
         self.height = len(cell_rows)
+        self._visible_seat_index = visible_seat_index
 
     @classmethod
     def from_input_lines(cls, lines):
@@ -107,6 +221,13 @@ class Grid:
         row, col = row_col_tuple
         return self.cell_rows[row][col]
 
+    @property
+    def visible_seat_index(self):
+        if self._visible_seat_index is None:
+            seat_mask = np.array([[cell.is_seat for cell in row] for row in self.cell_rows], dtype=bool)
+            self._visible_seat_index = SeatIndex.visible_from_seat_mask(seat_mask)
+        return self._visible_seat_index
+
     def adjacent_cell_coords_from_position(self, row_col_tuple):
         row, col = row_col_tuple
         adjacent_cell_tuples = []
@@ -132,7 +253,7 @@ class Grid:
         filtered_cells = list(filter(occupied_fn, cells))
         return len(filtered_cells)
 
-    def next_cell_iteration_for_cell_at_adjacent(self, row_col_tuple):
+    def next_cell_iteration_for_cell_at_adjacent(self, row_col_tuple, rules=DEFAULT_RULES['ADJACENT']):
         current_cell = self.cell_at(row_col_tuple)
 
         if current_cell.type == CellType.FLOOR:
@@ -142,10 +263,10 @@ class Grid:
 
         num_occupied_adjacent_cells = self.num_occupied_cells_from_cells(adjacent_cells)
 
-        if current_cell.state == CellState.EMPTY and num_occupied_adjacent_cells == 0:
+        if current_cell.state == CellState.EMPTY and num_occupied_adjacent_cells <= rules.occupy_max:
             return Cell.init_occupied()
 
-        if current_cell.state == CellState.OCCUPIED and num_occupied_adjacent_cells >= 4:
+        if current_cell.state == CellState.OCCUPIED and num_occupied_adjacent_cells >= rules.leave_min:
             return Cell.init_empty()
 
         return current_cell
@@ -232,7 +353,7 @@ class Grid:
         return visible_cell_tuples
 
     def visible_cells_from_position(self, row_col_tuple):
-        visible_cell_tuples = self.visible_cell_coords_from_position(row_col_tuple)
+        visible_cell_tuples = self.visible_seat_index.neighbour_coords(row_col_tuple)
         return [self.cell_at(visible_cell_tuple) for visible_cell_tuple in visible_cell_tuples]
 
     def num_occupied_visible_seats(self, row_col_tuple):
@@ -240,7 +361,7 @@ class Grid:
         num_occupied_visible_cells = self.num_occupied_cells_from_cells(visible_cells)
         return num_occupied_visible_cells
 
-    def next_cell_iteration_for_cell_at_visible(self, row_col_tuple):
+    def next_cell_iteration_for_cell_at_visible(self, row_col_tuple, rules=DEFAULT_RULES['VISIBLE']):
         current_cell = self.cell_at(row_col_tuple)
 
         if current_cell.type == CellType.FLOOR:
@@ -248,30 +369,31 @@ class Grid:
 
         num_occupied_visible_seats = self.num_occupied_visible_seats(row_col_tuple)
 
-        if current_cell.state == CellState.EMPTY and num_occupied_visible_seats == 0:
+        if current_cell.state == CellState.EMPTY and num_occupied_visible_seats <= rules.occupy_max:
             return Cell.init_occupied()
 
-        if current_cell.state == CellState.OCCUPIED and num_occupied_visible_seats >= 5:
+        if current_cell.state == CellState.OCCUPIED and num_occupied_visible_seats >= rules.leave_min:
             return Cell.init_empty()
 
         return current_cell
 
-    def next_cell_iteration_for_cell_at(self, row_col_tuple, lookup_version):
+    def next_cell_iteration_for_cell_at(self, row_col_tuple, lookup_version, rules=None):
+        rules = rules or DEFAULT_RULES[lookup_version]
         if lookup_version == 'ADJACENT':
-            return self.next_cell_iteration_for_cell_at_adjacent(row_col_tuple)
+            return self.next_cell_iteration_for_cell_at_adjacent(row_col_tuple, rules)
         else:
-            return self.next_cell_iteration_for_cell_at_visible(row_col_tuple)
+            return self.next_cell_iteration_for_cell_at_visible(row_col_tuple, rules)
 
     @classmethod
-    def from_previous_grid(cls, previous_grid, lookup_version):
+    def from_previous_grid(cls, previous_grid, lookup_version, rules=None):
         new_cell_rows = []
         for i in range(previous_grid.height):
             new_row = []
             for j in range(previous_grid.width):
-                new_row.append(previous_grid.next_cell_iteration_for_cell_at((i, j), lookup_version))
+                new_row.append(previous_grid.next_cell_iteration_for_cell_at((i, j), lookup_version, rules))
             new_cell_rows.append(new_row)
 
-        return cls(cell_rows=new_cell_rows)
+        return cls(cell_rows=new_cell_rows, visible_seat_index=previous_grid._visible_seat_index)
 
     def changed_from_previous_state(self, previous_grid):
         for i in range(self.height):
@@ -284,14 +406,548 @@ class Grid:
     def num_occupied_seats(self):
         return sum([sum([1 for cell in row if cell.is_occupied]) for row in self.cell_rows])
 
-def find_occupied_seats_at_equilibrium(lines, lookup_version):
-    previous_grid = Grid.from_input_lines(lines)
-    next_grid = Grid.from_previous_grid(previous_grid, lookup_version)
+
+class ArrayGrid:
+    """
+    Same rules as Grid, but the seat layout and the occupied seats are kept as two boolean
+    NumPy arrays so a whole generation is computed at once.
+    """
+    def __init__(self, seats, occupied, visible_seat_index=None):
+        self.seats = seats
+        self.occupied = occupied
+        self.height, self.width = seats.shape
+        self._visible_seat_index = visible_seat_index
+
+    @classmethod
+    def from_input_lines(cls, lines):
+        width = len(lines[0])
+        chars = np.frombuffer(''.join(lines).encode('ascii'), dtype=np.uint8).reshape(-1, width)
+        return cls(seats=chars != ord(Cell.FLOOR), occupied=chars == ord(Cell.OCCUPIED))
+
+    def __str__(self):
+        chars = np.full(self.seats.shape, Cell.FLOOR)
+        chars[self.seats] = Cell.EMPTY
+        chars[self.occupied] = Cell.OCCUPIED
+        return '\n'.join(['|'.join(row) for row in chars])
+
+    @property
+    def visible_seat_index(self):
+        if self._visible_seat_index is None:
+            self._visible_seat_index = SeatIndex.visible_from_seat_mask(self.seats)
+        return self._visible_seat_index
+
+    def num_occupied_visible_seats(self):
+        counts = np.zeros(self.seats.shape, dtype=np.uint8)
+        occupied_by_seat = np.append(self.occupied[self.seats], False)
+        counts[self.seats] = self.visible_seat_index.num_occupied_neighbours(occupied_by_seat)
+        return counts
+
+    def num_occupied_adjacent_seats(self):
+        return num_occupied_adjacent(np.pad(self.occupied, 1))
+
+    def num_occupied_neighbour_seats(self, lookup_version):
+        if lookup_version == 'ADJACENT':
+            return self.num_occupied_adjacent_seats()
+        else:
+            return self.num_occupied_visible_seats()
+
+    @classmethod
+    def from_previous_grid(cls, previous_grid, lookup_version, rules=None):
+        counts = previous_grid.num_occupied_neighbour_seats(lookup_version)
+        stays_or_becomes_occupied = next_occupied(previous_grid.occupied, counts, rules or DEFAULT_RULES[lookup_version])
+        return cls(
+            seats=previous_grid.seats,
+            occupied=previous_grid.seats & stays_or_becomes_occupied,
+            visible_seat_index=previous_grid._visible_seat_index,
+        )
+
+    def changed_from_previous_state(self, previous_grid):
+        return not np.array_equal(self.occupied, previous_grid.occupied)
+
+    def num_occupied_seats(self):
+        return int(np.count_nonzero(self.occupied))
+
+
+# set bits per byte value
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+class PackedGrid:
+    """
+    Same query surface as Grid, stored as two bitsets (is a seat / is occupied) in bytearrays,
+    i.e. 2 bits per position. Each row is padded to a whole number of bytes.
+    """
+    FLOOR_CELL = Cell.from_input_char(Cell.FLOOR)
+    EMPTY_CELL = Cell.from_input_char(Cell.EMPTY)
+    OCCUPIED_CELL = Cell.from_input_char(Cell.OCCUPIED)
+
+    ROWS_PER_CHUNK = 1024
+
+    def __init__(self, width, height, seat_bits, occupied_bits):
+        self.width = width
+        self.height = height
+        self.row_stride = (width + 7) // 8
+        self.seat_bits = seat_bits
+        self.occupied_bits = occupied_bits
+
+    @classmethod
+    def from_char_rows(cls, char_rows):
+        """
+        Packs a (height, width) uint8 array of input characters a chunk of rows at a time,
+        so the only full-size allocations are the two bitsets.
+        """
+        height, width = char_rows.shape
+        row_stride = (width + 7) // 8
+        seat_bits = bytearray(height * row_stride)
+        occupied_bits = bytearray(height * row_stride)
+        seat_view = np.frombuffer(seat_bits, dtype=np.uint8).reshape(height, row_stride)
+        occupied_view = np.frombuffer(occupied_bits, dtype=np.uint8).reshape(height, row_stride)
+
+        for start in range(0, height, cls.ROWS_PER_CHUNK):
+            chunk = char_rows[start:start + cls.ROWS_PER_CHUNK]
+            end = start + len(chunk)
+            seat_view[start:end] = np.packbits(chunk != ord(Cell.FLOOR), axis=1)
+            occupied_view[start:end] = np.packbits(chunk == ord(Cell.OCCUPIED), axis=1)
+
+        return cls(width=width, height=height, seat_bits=seat_bits, occupied_bits=occupied_bits)
+
+    @classmethod
+    def from_input_lines(cls, lines):
+        width = len(lines[0])
+        chars = np.frombuffer(''.join(lines).encode('ascii'), dtype=np.uint8).reshape(-1, width)
+        return cls.from_char_rows(chars)
+
+    @classmethod
+    def from_input_file(cls, path):
+        """
+        Reads the puzzle input through an mmap; the character rows are a strided view of the
+        mapped file (newlines skipped), so the text is never copied into Python strings.
+        """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            width = mapped.find(b'\n')
+            if width == -1:
+                width = len(mapped)
+            line_ending = 2 if width > 0 and mapped[width - 1:width] == b'\r' else 1
+            if line_ending == 2:
+                width -= 1
+            stride = width + line_ending
+            height = (len(mapped) + line_ending) // stride
+
+            buf = np.frombuffer(mapped, dtype=np.uint8)
+            char_rows = np.lib.stride_tricks.as_strided(buf, shape=(height, width), strides=(stride, 1))
+            grid = cls.from_char_rows(char_rows)
+            del buf, char_rows
+            return grid
+
+    @classmethod
+    def from_array_grid(cls, array_grid):
+        chars = np.full(array_grid.seats.shape, ord(Cell.FLOOR), dtype=np.uint8)
+        chars[array_grid.seats] = ord(Cell.EMPTY)
+        chars[array_grid.occupied] = ord(Cell.OCCUPIED)
+        return cls.from_char_rows(chars)
+
+    def to_array_grid(self):
+        def unpack(bits):
+            rows = np.frombuffer(bits, dtype=np.uint8).reshape(self.height, self.row_stride)
+            return np.unpackbits(rows, axis=1, count=self.width).astype(bool)
+
+        return ArrayGrid(seats=unpack(self.seat_bits), occupied=unpack(self.occupied_bits))
+
+    def _bit_at(self, bits, row, col):
+        return (bits[row * self.row_stride + col // 8] >> (7 - col % 8)) & 1
+
+    def cell_at(self, row_col_tuple):
+        row, col = row_col_tuple
+        if not self._bit_at(self.seat_bits, row, col):
+            return self.FLOOR_CELL
+        if self._bit_at(self.occupied_bits, row, col):
+            return self.OCCUPIED_CELL
+        return self.EMPTY_CELL
+
+    def __str__(self):
+        joined_cells = []
+        for row in range(self.height):
+            joined_cells.append('|'.join([str(self.cell_at((row, col))) for col in range(self.width)]))
+        return '\n'.join(joined_cells)
+
+    def num_occupied_seats(self):
+        return int(POPCOUNT[np.frombuffer(self.occupied_bits, dtype=np.uint8)].sum(dtype=np.int64))
+
+
+class FrontierGrid:
+    """
+    Seat-level engine that tracks which seats changed in the last generation and only
+    re-evaluates those seats and their neighbours. Equilibrium is reached when nothing
+    changed, so late generations cost O(changes) rather than O(grid).
+    """
+    def __init__(self, seat_index, occupied_by_seat, rules):
+        self.seat_index = seat_index
+        self.occupied_by_seat = occupied_by_seat
+        self.rules = rules
+        self.changed_seats = None
+
+    @classmethod
+    def from_input_lines(cls, lines, lookup_version, rules=None):
+        grid = ArrayGrid.from_input_lines(lines)
+        return cls(
+            seat_index=SeatIndex.from_seat_mask(grid.seats, lookup_version),
+            occupied_by_seat=np.append(grid.occupied[grid.seats], False),
+            rules=rules or DEFAULT_RULES[lookup_version],
+        )
+
+    def dirty_seats(self):
+        if self.changed_seats is None:
+            return np.arange(self.seat_index.num_seats)
+
+        dirty = np.union1d(self.changed_seats, self.seat_index.neighbours[self.changed_seats])
+        return dirty[dirty >= 0]
+
+    def step(self):
+        dirty = self.dirty_seats()
+        counts = self.seat_index.num_occupied_neighbours(self.occupied_by_seat, dirty)
+        was_occupied = self.occupied_by_seat[dirty]
+        now_occupied = next_occupied(was_occupied, counts, self.rules)
+
+        self.changed_seats = dirty[now_occupied != was_occupied]
+        self.occupied_by_seat[self.changed_seats] = ~self.occupied_by_seat[self.changed_seats]
+        return len(self.changed_seats)
+
+    def num_occupied_seats(self):
+        return int(np.count_nonzero(self.occupied_by_seat))
+
+def find_occupied_seats_at_equilibrium_frontier(lines, lookup_version, rules=None):
+    grid = FrontierGrid.from_input_lines(lines, lookup_version, rules)
+    count = 0
+    while grid.step() > 0:
+        count += 1
+
+    print('found equilibrium at %r iterations' % count)
+    return grid.num_occupied_seats()
+
+
+class StateHasher:
+    """
+    Rolling (Zobrist) hash of the occupied bitmap: every seat has a random 128-bit key and
+    the hash is the XOR of the keys of the occupied seats, so a generation updates it with
+    just the keys of the seats that changed.
+    """
+    def __init__(self, num_seats, seed=0):
+        self.keys = np.random.default_rng(seed).integers(
+            0, np.iinfo(np.uint64).max, size=(num_seats, 2), dtype=np.uint64, endpoint=True,
+        )
+        self.value = np.zeros(2, dtype=np.uint64)
+
+    def reset(self, occupied_seats):
+        self.value = np.zeros(2, dtype=np.uint64)
+        self.toggle(occupied_seats)
+
+    def toggle(self, changed_seats):
+        if len(changed_seats):
+            self.value = self.value ^ np.bitwise_xor.reduce(self.keys[changed_seats], axis=0)
+
+    def digest(self):
+        return self.value.tobytes()
+
+class CycleDetector:
+    """
+    Remembers the hashes of the last history_window generations. A state that repeats one
+    seen at generation g0 means the simulation is in a cycle that started at g0; equilibrium
+    is just a cycle of period 1. Cycles longer than the window are not detected.
+    """
+    def __init__(self, history_window):
+        self.history_window = history_window
+        self.history = deque()
+        self.generations_by_digest = {}
+
+    def observe(self, generation, digest):
+        first_seen = self.generations_by_digest.get(digest)
+        if first_seen is not None:
+            return (first_seen, generation - first_seen)
+
+        self.history.append(digest)
+        self.generations_by_digest[digest] = generation
+        if len(self.history) > self.history_window:
+            del self.generations_by_digest[self.history.popleft()]
+        return None
+
+CycleReport = namedtuple('CycleReport', ['cycle_start', 'period', 'generations', 'num_occupied_seats'])
+
+def find_seating_cycle(lines, lookup_version, rules=None, history_window=1024, max_generations=1 << 16):
+    """
+    Steps the simulation until a state repeats (or max_generations is reached, in which case
+    cycle_start and period are None; pass None to search without a limit). The occupied count
+    is that of the state at the cycle start, which every later generation of the cycle
+    returns to.
+    """
+    grid = FrontierGrid.from_input_lines(lines, lookup_version, rules)
+    hasher = StateHasher(grid.seat_index.num_seats)
+    hasher.reset(np.flatnonzero(grid.occupied_by_seat))
+    detector = CycleDetector(history_window)
+
+    generation = 0
+    cycle = detector.observe(generation, hasher.digest())
+    while cycle is None:
+        if max_generations is not None and generation >= max_generations:
+            return CycleReport(None, None, generation, grid.num_occupied_seats())
+
+        grid.step()
+        generation += 1
+        hasher.toggle(grid.changed_seats)
+        cycle = detector.observe(generation, hasher.digest())
+
+    cycle_start, period = cycle
+    print('found cycle of period %r starting at generation %r' % (period, cycle_start))
+    return CycleReport(cycle_start, period, generation, grid.num_occupied_seats())
+
+
+class DoubleBufferedGrid:
+    """
+    Seat-level engine that alternates between two preallocated occupied buffers and counts
+    the changed seats as part of each step, so "did anything change" needs no extra grid
+    comparison. Apart from the changed count it records, a steady-state step allocates no
+    arrays: every gather and ufunc writes into the preallocated buffers.
+    """
+    def __init__(self, seat_index, occupied_by_seat, rules):
+        num_seats = seat_index.num_seats
+        self.num_seats = num_seats
+        self.rules = rules
+        # intp indices and mode='wrap' let take write straight into its out buffer; both
+        # buffers carry a trailing False, so -1 (no neighbour) wraps round to read as empty
+        self.neighbour_columns = list(np.ascontiguousarray(seat_index.neighbours.T, dtype=np.intp))
+        self.buffers = [occupied_by_seat, occupied_by_seat.copy()]
+        self.seat_views = [buffer[:num_seats] for buffer in self.buffers]
+        self.current = 0
+
+        self.counts = np.zeros(num_seats, dtype=np.uint8)
+        self.gathered = np.zeros(num_seats, dtype=bool)
+        # adding the neighbour flags as uint8 avoids a bool-to-uint8 casting buffer per add
+        self.gathered_counts = self.gathered.view(np.uint8)
+        self.leave_min = np.uint8(rules.leave_min)
+        self.occupy_max = np.uint8(rules.occupy_max)
+        self.staying = np.zeros(num_seats, dtype=bool)
+        self.arriving = np.zeros(num_seats, dtype=bool)
+
+        self.generation = 0
+        self.changed_counts = []
+
+    @classmethod
+    def from_input_lines(cls, lines, lookup_version, rules=None):
+        grid = ArrayGrid.from_input_lines(lines)
+        return cls(
+            seat_index=SeatIndex.from_seat_mask(grid.seats, lookup_version),
+            occupied_by_seat=np.append(grid.occupied[grid.seats], False),
+            rules=rules or DEFAULT_RULES[lookup_version],
+        )
+
+    @property
+    def occupied_by_seat(self):
+        return self.seat_views[self.current]
+
+    def step(self):
+        previous = self.buffers[self.current]
+        was_occupied = self.seat_views[self.current]
+        now_occupied = self.seat_views[1 - self.current]
+
+        self.counts.fill(0)
+        for column in self.neighbour_columns:
+            previous.take(column, out=self.gathered, mode='wrap')
+            np.add(self.counts, self.gathered_counts, out=self.counts)
+
+        np.less(self.counts, self.leave_min, out=self.staying)
+        np.logical_and(self.staying, was_occupied, out=self.staying)
+        np.greater(self.counts, self.occupy_max, out=self.arriving)
+        np.logical_or(self.arriving, was_occupied, out=self.arriving)
+        np.logical_not(self.arriving, out=self.arriving)
+        np.logical_or(self.staying, self.arriving, out=now_occupied)
+
+        np.not_equal(was_occupied, now_occupied, out=self.staying)
+        changed_count = int(np.count_nonzero(self.staying))
+
+        self.current = 1 - self.current
+        self.generation += 1
+        self.changed_counts.append(changed_count)
+        return changed_count
+
+    def num_occupied_seats(self):
+        return int(np.count_nonzero(self.occupied_by_seat))
+
+def find_occupied_seats_at_equilibrium_double_buffered(lines, lookup_version, rules=None, on_generation=None):
+    """
+    on_generation, if given, is called with (generation, changed_count) after every step.
+    """
+    grid = DoubleBufferedGrid.from_input_lines(lines, lookup_version, rules)
+    while True:
+        changed_count = grid.step()
+        if on_generation:
+            on_generation(grid.generation, changed_count)
+        if changed_count == 0:
+            break
+
+    print('found equilibrium at %r iterations' % (grid.generation - 1))
+    return grid.num_occupied_seats()
+
+
+class SharedArrays:
+    """
+    NumPy arrays backed by multiprocessing.shared_memory blocks. The layout (block names,
+    shapes and dtypes) is all a worker process needs to attach to the same arrays.
+    """
+    def __init__(self):
+        self.blocks = []
+        self.arrays = {}
+        self.layout = {}
+
+    def create(self, key, shape, dtype):
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        block = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        self.blocks.append(block)
+        self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        self.layout[key] = (block.name, shape, np.dtype(dtype).str)
+        return self.arrays[key]
+
+    @classmethod
+    def attach(cls, layout):
+        shared = cls()
+        for key, (name, shape, dtype) in layout.items():
+            block = shared_memory.SharedMemory(name=name)
+            shared.blocks.append(block)
+            shared.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        shared.layout = layout
+        return shared
+
+    def close(self, unlink=False):
+        self.arrays = {}
+        for block in self.blocks:
+            block.close()
+            if unlink:
+                block.unlink()
+        self.blocks = []
+
+_band_worker_arrays = None
+
+def _init_band_worker(layout):
+    global _band_worker_arrays
+    _band_worker_arrays = SharedArrays.attach(layout)
+
+def _step_adjacent_band(band):
+    """
+    Computes rows [start, end) of the next generation from the shared previous generation,
+    reading one halo row above and below the band.
+    """
+    start, end, src, dst, rules = band
+    arrays = _band_worker_arrays.arrays
+    seats = arrays['seats']
+    height, width = seats.shape
+    previous = arrays['occupied'][src, :height * width].reshape(height, width)
+    following = arrays['occupied'][dst, :height * width].reshape(height, width)
+
+    halo = previous[max(start - 1, 0):min(end + 1, height)]
+    padding = ((1 if start == 0 else 0, 1 if end == height else 0), (1, 1))
+    counts = num_occupied_adjacent(np.pad(halo, padding))
+
+    was_occupied = previous[start:end]
+    now_occupied = seats[start:end] & next_occupied(was_occupied, counts, rules)
+    following[start:end] = now_occupied
+    return bool((now_occupied != was_occupied).any())
+
+def _step_visible_band(band):
+    """
+    Line of sight can reach any row, so a VISIBLE band looks its seats up in the shared
+    neighbour index (flat cell positions) rather than relying on halo rows.
+    """
+    start, end, src, dst, rules = band
+    arrays = _band_worker_arrays.arrays
+    previous = arrays['occupied'][src]
+    following = arrays['occupied'][dst]
+    cells = arrays['seat_cells'][start:end]
+
+    counts = np.count_nonzero(previous[arrays['neighbour_cells'][start:end]], axis=1)
+    was_occupied = previous[cells]
+    now_occupied = next_occupied(was_occupied, counts, rules)
+    following[cells] = now_occupied
+    return bool((now_occupied != was_occupied).any())
+
+def find_occupied_seats_at_equilibrium_parallel(lines, lookup_version, rules=None, processes=None):
+    """
+    Splits every generation across a process pool in row bands. Both generations live in
+    shared memory and alternate as source and destination; pool.map returning is the
+    per-generation barrier, after which the bands' changed flags are combined.
+    """
+    processes = processes or os.cpu_count()
+    grid = ArrayGrid.from_input_lines(lines)
+    height, width = grid.seats.shape
+    num_cells = height * width
+
+    shared = SharedArrays()
+    try:
+        shared.create('seats', grid.seats.shape, bool)[:] = grid.seats
+        # both buffers carry a trailing False cell that stands in for "no neighbour"
+        occupied = shared.create('occupied', (2, num_cells + 1), bool)
+        occupied[:] = False
+        occupied[:, :num_cells] = grid.occupied.ravel()
+
+        if lookup_version == 'ADJACENT':
+            step_band = _step_adjacent_band
+            bounds = np.linspace(0, height, min(processes, height) + 1).astype(int)
+        else:
+            step_band = _step_visible_band
+            seat_index = grid.visible_seat_index
+            seat_cells = seat_index.seat_coords[:, 0].astype(np.int64) * width + seat_index.seat_coords[:, 1]
+            neighbour_cells = np.where(seat_index.neighbours >= 0, seat_cells[seat_index.neighbours], num_cells)
+            shared.create('seat_cells', seat_cells.shape, np.int64)[:] = seat_cells
+            shared.create('neighbour_cells', neighbour_cells.shape, np.int64)[:] = neighbour_cells
+            # bands of whole rows, expressed as ranges of the row-major seat numbering
+            row_bounds = np.linspace(0, height, min(processes, height) + 1).astype(int)
+            bounds = np.searchsorted(seat_cells, row_bounds * width)
+        bands = [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+        rules = rules or DEFAULT_RULES[lookup_version]
+        src = 0
+        count = 0
+        with Pool(processes, initializer=_init_band_worker, initargs=(shared.layout,)) as pool:
+            while any(pool.map(step_band, [(start, end, src, 1 - src, rules) for start, end in bands])):
+                count += 1
+                src = 1 - src
+
+        print('found equilibrium at %r iterations' % count)
+        return int(np.count_nonzero(occupied[src]))
+    finally:
+        shared.close(unlink=True)
+
+
+GRID_ENGINES = {
+    'OBJECT': Grid,
+    'NUMPY': ArrayGrid,
+}
+
+def find_occupied_seats_at_equilibrium(lines, lookup_version, engine='OBJECT', rules=None):
+    """
+    With custom rules the seating may never settle, so they are first run through
+    find_seating_cycle: a cycle of period above 1, or none found within its generation
+    limit, raises ValueError instead of stepping forever.
+    """
+    if rules is not None and rules != DEFAULT_RULES[lookup_version]:
+        report = find_seating_cycle(lines, lookup_version, rules)
+        if report.period is None:
+            raise ValueError('Seating did not settle or repeat within %r generations' % report.generations)
+        if report.period > 1:
+            raise ValueError('Seating never settles: cycle of period %r starting at generation %r' % (
+                report.period, report.cycle_start))
+
+    if engine == 'FRONTIER':
+        return find_occupied_seats_at_equilibrium_frontier(lines, lookup_version, rules)
+    if engine == 'PARALLEL':
+        return find_occupied_seats_at_equilibrium_parallel(lines, lookup_version, rules)
+    if engine == 'DOUBLE_BUFFERED':
+        return find_occupied_seats_at_equilibrium_double_buffered(lines, lookup_version, rules)
+
+    grid_cls = GRID_ENGINES[engine]
+    previous_grid = grid_cls.from_input_lines(lines)
+    next_grid = grid_cls.from_previous_grid(previous_grid, lookup_version, rules)
     count = 0
     while next_grid.changed_from_previous_state(previous_grid):
         count += 1
         previous_grid = next_grid
-        next_grid = Grid.from_previous_grid(previous_grid, lookup_version)
+        next_grid = grid_cls.from_previous_grid(previous_grid, lookup_version, rules)
 
     print('found equilibrium at %r iterations' % count)
     return next_grid.num_occupied_seats()
@@ -305,10 +961,16 @@ def main():
     result = find_occupied_seats_at_equilibrium(lines, lookup_version)
     print(result)
 
+    result = find_occupied_seats_at_equilibrium(lines, lookup_version, engine='NUMPY')
+    print(result)
+
     lookup_version = 'VISIBLE'
     result = find_occupied_seats_at_equilibrium(lines, lookup_version)
     print(result)
 
+    result = find_occupied_seats_at_equilibrium(lines, lookup_version, engine='NUMPY')
+    print(result)
+
 
 if __name__ == '__main__':
     main()
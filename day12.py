@@ -13,6 +13,9 @@ Figure out where the navigation instructions lead. What is the Manhattan distanc
 """
 from collections import namedtuple
 from enum import Enum, auto
+from multiprocessing import Pool
+
+import numpy as np
 
 class Heading(Enum):
     NORTH = 0
@@ -231,6 +234,366 @@ def process_instructions_2(lines):
     ship.run_instructions(instructions)
     return ship.manhattan_distance_from_origin()
 
+"""
+Every instruction is an affine map on the (ship, waypoint) state, treating positions as
+Gaussian integers x + yi:
+
+    waypoint' = rotation * waypoint + waypoint_shift
+    ship'     = ship + ship_gain * waypoint + ship_shift
+
+For Ship the "waypoint" is the unit heading vector and N/E/S/W shift the ship; for Ship2
+they shift the waypoint. Maps of this form compose into another map of the same form, so a
+whole program compiles down to one NavigationTransform. Arithmetic is on Python ints, so it
+is exact for any program length.
+"""
+
+def complex_mul(p, q):
+    return Position(x=p.x * q.x - p.y * q.y, y=p.x * q.y + p.y * q.x)
+
+def complex_add(p, q):
+    return Position(x=p.x + q.x, y=p.y + q.y)
+
+class NavigationMode(Enum):
+    SHIP = auto()
+    WAYPOINT = auto()
+
+# Ship treats north as -y, Ship2 as +y, so a clockwise quarter turn differs between them
+DIRECTION_VECTORS = {
+    NavigationMode.SHIP: {
+        InstructionType.NORTH: Position(x=0, y=-1),
+        InstructionType.EAST: Position(x=1, y=0),
+        InstructionType.SOUTH: Position(x=0, y=1),
+        InstructionType.WEST: Position(x=-1, y=0),
+    },
+    NavigationMode.WAYPOINT: {
+        InstructionType.NORTH: Position(x=0, y=1),
+        InstructionType.EAST: Position(x=1, y=0),
+        InstructionType.SOUTH: Position(x=0, y=-1),
+        InstructionType.WEST: Position(x=-1, y=0),
+    },
+}
+
+RIGHT_QUARTER_TURNS = {
+    NavigationMode.SHIP: Position(x=0, y=1),
+    NavigationMode.WAYPOINT: Position(x=0, y=-1),
+}
+
+def quarter_turns(mode, instruction):
+    turns = int(instruction.num_units / 90) % 4
+    if instruction.type == InstructionType.LEFT:
+        turns = (4 - turns) % 4
+
+    rotation = Position(x=1, y=0)
+    for _ in range(turns):
+        rotation = complex_mul(rotation, RIGHT_QUARTER_TURNS[mode])
+    return rotation
+
+class NavigationTransform:
+    def __init__(self, rotation, waypoint_shift, ship_gain, ship_shift):
+        self.rotation = rotation
+        self.waypoint_shift = waypoint_shift
+        self.ship_gain = ship_gain
+        self.ship_shift = ship_shift
+
+    def __str__(self):
+        return "<NavigationTransform rotation={} waypoint_shift={} ship_gain={} ship_shift={}>".format(
+            self.rotation, self.waypoint_shift, self.ship_gain, self.ship_shift)
+
+    @classmethod
+    def identity(cls):
+        origin = Position(x=0, y=0)
+        return cls(rotation=Position(x=1, y=0), waypoint_shift=origin, ship_gain=origin, ship_shift=origin)
+
+    @classmethod
+    def compile(cls, instructions, mode):
+        """
+        Folds the instructions into one transform in a single pass, keeping the coefficients
+        in plain ints rather than building a transform per instruction.
+        """
+        direction_vectors = DIRECTION_VECTORS[mode]
+        rx, ry = 1, 0
+        wx, wy = 0, 0
+        gx, gy = 0, 0
+        sx, sy = 0, 0
+
+        for instr in instructions:
+            if instr.type == InstructionType.FORWARD:
+                gx, gy = gx + instr.num_units * rx, gy + instr.num_units * ry
+                sx, sy = sx + instr.num_units * wx, sy + instr.num_units * wy
+            elif instr.type in direction_vectors:
+                d = direction_vectors[instr.type]
+                if mode == NavigationMode.SHIP:
+                    sx, sy = sx + instr.num_units * d.x, sy + instr.num_units * d.y
+                else:
+                    wx, wy = wx + instr.num_units * d.x, wy + instr.num_units * d.y
+            else:
+                q = quarter_turns(mode, instr)
+                rx, ry = rx * q.x - ry * q.y, rx * q.y + ry * q.x
+                wx, wy = wx * q.x - wy * q.y, wx * q.y + wy * q.x
+
+        return cls(
+            rotation=Position(x=rx, y=ry),
+            waypoint_shift=Position(x=wx, y=wy),
+            ship_gain=Position(x=gx, y=gy),
+            ship_shift=Position(x=sx, y=sy),
+        )
+
+    def then(self, other):
+        """
+        The transform that applies self and then other.
+        """
+        return NavigationTransform(
+            rotation=complex_mul(other.rotation, self.rotation),
+            waypoint_shift=complex_add(complex_mul(other.rotation, self.waypoint_shift), other.waypoint_shift),
+            ship_gain=complex_add(self.ship_gain, complex_mul(other.ship_gain, self.rotation)),
+            ship_shift=complex_add(
+                complex_add(self.ship_shift, complex_mul(other.ship_gain, self.waypoint_shift)),
+                other.ship_shift,
+            ),
+        )
+
+    def apply(self, ship_position, waypoint):
+        """
+        Returns the (ship_position, waypoint) reached from the given start.
+        """
+        new_waypoint = complex_add(complex_mul(self.rotation, waypoint), self.waypoint_shift)
+        new_ship_position = complex_add(
+            complex_add(ship_position, complex_mul(self.ship_gain, waypoint)),
+            self.ship_shift,
+        )
+        return (new_ship_position, new_waypoint)
+
+def process_instructions_compiled(lines, mode):
+    instructions = [Instruction.from_input_line(line) for line in lines]
+    transform = NavigationTransform.compile(instructions, mode)
+
+    origin = Position(x=0, y=0)
+    if mode == NavigationMode.SHIP:
+        waypoint = DIRECTION_VECTORS[mode][InstructionType.EAST]
+    else:
+        waypoint = Position(x=10, y=1)
+
+    ship_position, _ = transform.apply(origin, waypoint)
+    return abs(ship_position.x) + abs(ship_position.y)
+
+"""
+Trajectories: the prefix of a program up to instruction i is itself a NavigationTransform,
+and the prefixes of all instructions can be computed with cumulative sums over per-instruction
+coefficient arrays. Chunks of a long log are scanned independently (possibly in a process
+pool); each chunk only needs the state reached at the end of the previous chunk, which comes
+from composing the chunk totals.
+"""
+
+INSTRUCTION_CODES = {type_: code for code, type_ in enumerate(InstructionType)}
+
+# (x, y) of the k-th power of a clockwise quarter turn, for k = 0..3
+QUARTER_TURN_TABLES = {
+    mode: np.array([
+        (1, 0),
+        (turn.x, turn.y),
+        (-1, 0),
+        (-turn.x, -turn.y),
+    ], dtype=np.int64)
+    for mode, turn in RIGHT_QUARTER_TURNS.items()
+}
+
+Trajectory = namedtuple('Trajectory', ['ship_x', 'ship_y', 'waypoint_x', 'waypoint_y'])
+
+def encode_instructions(instructions):
+    type_codes = np.fromiter((INSTRUCTION_CODES[instr.type] for instr in instructions), dtype=np.int8)
+    num_units = np.fromiter((instr.num_units for instr in instructions), dtype=np.int64)
+    return (type_codes, num_units)
+
+def complex_mul_arrays(p, q):
+    return (p[0] * q[0] - p[1] * q[1], p[0] * q[1] + p[1] * q[0])
+
+def instruction_coefficients(type_codes, num_units, mode):
+    """
+    Per-instruction pieces of the transform: clockwise quarter turns, waypoint shift,
+    ship gain and ship shift.
+    """
+    turns = np.zeros(len(type_codes), dtype=np.int64)
+    is_right = type_codes == INSTRUCTION_CODES[InstructionType.RIGHT]
+    is_left = type_codes == INSTRUCTION_CODES[InstructionType.LEFT]
+    turns[is_right] = num_units[is_right] // 90
+    turns[is_left] = -(num_units[is_left] // 90)
+    turns %= 4
+
+    shift_x = np.zeros(len(type_codes), dtype=np.int64)
+    shift_y = np.zeros(len(type_codes), dtype=np.int64)
+    for type_, direction in DIRECTION_VECTORS[mode].items():
+        is_direction = type_codes == INSTRUCTION_CODES[type_]
+        shift_x[is_direction] = num_units[is_direction] * direction.x
+        shift_y[is_direction] = num_units[is_direction] * direction.y
+
+    zeros = np.zeros(len(type_codes), dtype=np.int64)
+    gain = np.where(type_codes == INSTRUCTION_CODES[InstructionType.FORWARD], num_units, 0)
+    if mode == NavigationMode.SHIP:
+        return (turns, (zeros, zeros), gain, (shift_x, shift_y))
+    else:
+        return (turns, (shift_x, shift_y), gain, (zeros, zeros))
+
+def scan_transforms(type_codes, num_units, mode):
+    """
+    Inclusive prefix transforms for every instruction, as (rotation, waypoint_shift,
+    ship_gain, ship_shift) with each part an (x array, y array) pair.
+    """
+    turns, waypoint_shifts, gains, ship_shifts = instruction_coefficients(type_codes, num_units, mode)
+    table = QUARTER_TURN_TABLES[mode]
+
+    prefix_turns = np.cumsum(turns) % 4
+    previous_turns = (prefix_turns - turns) % 4
+    rotation = (table[prefix_turns, 0], table[prefix_turns, 1])
+    previous_rotation = (table[previous_turns, 0], table[previous_turns, 1])
+    inverse_turns = (-prefix_turns) % 4
+    inverse_rotation = (table[inverse_turns, 0], table[inverse_turns, 1])
+
+    # waypoint_shift_i = rotation_i * sum_{j <= i} rotation_j^-1 * shift_j
+    unrotated = complex_mul_arrays(inverse_rotation, waypoint_shifts)
+    waypoint_shift = complex_mul_arrays(rotation, (np.cumsum(unrotated[0]), np.cumsum(unrotated[1])))
+
+    ship_gain = (np.cumsum(gains * previous_rotation[0]), np.cumsum(gains * previous_rotation[1]))
+
+    previous_waypoint_shift = (
+        np.concatenate(([0], waypoint_shift[0][:-1])),
+        np.concatenate(([0], waypoint_shift[1][:-1])),
+    )
+    ship_shift = (
+        np.cumsum(gains * previous_waypoint_shift[0] + ship_shifts[0]),
+        np.cumsum(gains * previous_waypoint_shift[1] + ship_shifts[1]),
+    )
+    return (rotation, waypoint_shift, ship_gain, ship_shift)
+
+def apply_prefix_transforms(prefixes, ship_position, waypoint):
+    rotation, waypoint_shift, ship_gain, ship_shift = prefixes
+    waypoint_arr = (np.int64(waypoint.x), np.int64(waypoint.y))
+    rotated = complex_mul_arrays(rotation, waypoint_arr)
+    gained = complex_mul_arrays(ship_gain, waypoint_arr)
+    return Trajectory(
+        ship_x=ship_position.x + gained[0] + ship_shift[0],
+        ship_y=ship_position.y + gained[1] + ship_shift[1],
+        waypoint_x=rotated[0] + waypoint_shift[0],
+        waypoint_y=rotated[1] + waypoint_shift[1],
+    )
+
+def _chunk_total(chunk):
+    type_codes, num_units, mode = chunk
+    rotation, waypoint_shift, ship_gain, ship_shift = scan_transforms(type_codes, num_units, mode)
+    last = lambda part: Position(x=int(part[0][-1]), y=int(part[1][-1]))
+    return NavigationTransform(
+        rotation=last(rotation),
+        waypoint_shift=last(waypoint_shift),
+        ship_gain=last(ship_gain),
+        ship_shift=last(ship_shift),
+    )
+
+def _chunk_trajectory(chunk):
+    type_codes, num_units, mode, ship_position, waypoint = chunk
+    return apply_prefix_transforms(scan_transforms(type_codes, num_units, mode), ship_position, waypoint)
+
+def compute_trajectory(instructions, mode, ship_position, waypoint, processes=None, chunk_size=1 << 20):
+    """
+    Ship and waypoint (heading, for NavigationMode.SHIP) after every instruction, as int64
+    arrays. With processes set, chunks are scanned in a process pool: one pass for the
+    chunk totals, then one pass for the trajectories once each chunk's start state is known.
+    """
+    type_codes, num_units = encode_instructions(instructions)
+    bounds = list(range(0, len(type_codes), chunk_size)) + [len(type_codes)]
+    chunks = [(type_codes[start:end], num_units[start:end], mode) for start, end in zip(bounds[:-1], bounds[1:])]
+    if not chunks:
+        empty = np.zeros(0, dtype=np.int64)
+        return Trajectory(empty, empty, empty, empty)
+
+    pool = Pool(processes) if processes else None
+    try:
+        map_fn = pool.map if pool else lambda fn, items: list(map(fn, items))
+
+        start_states = [(ship_position, waypoint)]
+        for total in map_fn(_chunk_total, chunks[:-1]):
+            start_states.append(total.apply(*start_states[-1]))
+
+        parts = map_fn(_chunk_trajectory, [chunk + state for chunk, state in zip(chunks, start_states)])
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    return Trajectory(*[np.concatenate([getattr(part, field) for part in parts]) for field in Trajectory._fields])
+
+def compute_ship_trajectory(lines, processes=None):
+    instructions = [Instruction.from_input_line(line) for line in lines]
+    heading = DIRECTION_VECTORS[NavigationMode.SHIP][InstructionType.EAST]
+    return compute_trajectory(instructions, NavigationMode.SHIP, Position(x=0, y=0), heading, processes)
+
+def compute_ship2_trajectory(lines, processes=None):
+    instructions = [Instruction.from_input_line(line) for line in lines]
+    return compute_trajectory(instructions, NavigationMode.WAYPOINT, Position(x=0, y=0), Position(x=10, y=1), processes)
+
+class Fleet:
+    """
+    Many ships following the same instructions, kept as structure-of-arrays: one int64 array
+    per coordinate. Each instruction is decoded once and applied to the whole fleet with a
+    single vectorised update. For NavigationMode.SHIP the waypoint arrays hold the heading.
+    """
+    def __init__(self, mode, ship_x, ship_y, waypoint_x, waypoint_y):
+        self.mode = mode
+        self.ship_x = np.array(ship_x, dtype=np.int64)
+        self.ship_y = np.array(ship_y, dtype=np.int64)
+        self.waypoint_x = np.array(waypoint_x, dtype=np.int64)
+        self.waypoint_y = np.array(waypoint_y, dtype=np.int64)
+
+    @classmethod
+    def from_positions(cls, mode, ship_positions, waypoints):
+        return cls(
+            mode=mode,
+            ship_x=[p.x for p in ship_positions],
+            ship_y=[p.y for p in ship_positions],
+            waypoint_x=[w.x for w in waypoints],
+            waypoint_y=[w.y for w in waypoints],
+        )
+
+    def __len__(self):
+        return len(self.ship_x)
+
+    def rotate_waypoints(self, rotation):
+        new_waypoint_x = self.waypoint_x * rotation.x - self.waypoint_y * rotation.y
+        self.waypoint_y *= rotation.x
+        self.waypoint_y += self.waypoint_x * rotation.y
+        self.waypoint_x = new_waypoint_x
+
+    def update(self, instruction):
+        direction_vectors = DIRECTION_VECTORS[self.mode]
+        if instruction.type == InstructionType.FORWARD:
+            self.ship_x += instruction.num_units * self.waypoint_x
+            self.ship_y += instruction.num_units * self.waypoint_y
+        elif instruction.type in direction_vectors:
+            d = direction_vectors[instruction.type]
+            if self.mode == NavigationMode.SHIP:
+                self.ship_x += instruction.num_units * d.x
+                self.ship_y += instruction.num_units * d.y
+            else:
+                self.waypoint_x += instruction.num_units * d.x
+                self.waypoint_y += instruction.num_units * d.y
+        else:
+            self.rotate_waypoints(quarter_turns(self.mode, instruction))
+
+    def run_instructions(self, instructions):
+        for instr in instructions:
+            self.update(instr)
+
+    def apply_transform(self, transform):
+        """
+        Same result as run_instructions for the program the transform was compiled from.
+        """
+        self.ship_x += transform.ship_gain.x * self.waypoint_x - transform.ship_gain.y * self.waypoint_y + transform.ship_shift.x
+        self.ship_y += transform.ship_gain.x * self.waypoint_y + transform.ship_gain.y * self.waypoint_x + transform.ship_shift.y
+        self.rotate_waypoints(transform.rotation)
+        self.waypoint_x += transform.waypoint_shift.x
+        self.waypoint_y += transform.waypoint_shift.y
+
+    def manhattan_distances_from_origin(self):
+        return np.abs(self.ship_x) + np.abs(self.ship_y)
+
 def main():
     with open('day12.txt') as f:
         lines = [line.strip() for line in f.readlines()]
@@ -241,5 +604,11 @@ def main():
     result = process_instructions_2(lines)
     print(result)
 
+    result = process_instructions_compiled(lines, NavigationMode.SHIP)
+    print(result)
+
+    result = process_instructions_compiled(lines, NavigationMode.WAYPOINT)
+    print(result)
+
 if __name__ == '__main__':
     main()
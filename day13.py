@@ -8,7 +8,10 @@ To save time once you arrive, your goal is to figure out the earliest bus you ca
 What is the ID of the earliest bus you can take to the airport multiplied by the number of minutes you'll need to wait for that bus?
 """
 
-from math import floor, inf
+from functools import reduce
+from math import floor, gcd, inf
+
+import numpy as np
 
 def find_first_bus(lines):
     start_time = int(lines[0])
@@ -28,6 +31,52 @@ def find_first_bus(lines):
 
     return lowest_wait_time_for_bus
 
+class DepartureIndex:
+    """
+    Answers "which bus leaves first at or after t" for many timestamps against one schedule.
+    Waits only depend on t modulo the LCM of the bus IDs, so when that window is small every
+    answer is precomputed into a table; otherwise each batch is computed with integer array
+    arithmetic. All arithmetic stays in int64, so any non-negative 64-bit timestamp is exact.
+    Ties go to the bus listed first.
+    """
+    MAX_TABLE_SIZE = 1 << 20
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, bus_ids, max_table_size=MAX_TABLE_SIZE):
+        self.bus_ids = np.asarray(bus_ids, dtype=np.int64)
+        self.window = reduce(lambda a, b: a * b // gcd(a, b), self.bus_ids.tolist(), 1)
+        self.table = None
+        if self.window <= max_table_size:
+            self.table = self._compute(np.arange(self.window, dtype=np.int64))
+
+    @classmethod
+    def from_input_lines(cls, lines, max_table_size=MAX_TABLE_SIZE):
+        return cls([bus_id for _, bus_id in parse_bus_offsets(lines[1])], max_table_size)
+
+    def _compute(self, timestamps):
+        bus_positions = np.empty(len(timestamps), dtype=np.int64)
+        wait_times = np.empty(len(timestamps), dtype=np.int64)
+        for start in range(0, len(timestamps), self.CHUNK_SIZE):
+            chunk = timestamps[start:start + self.CHUNK_SIZE, np.newaxis]
+            waits = (self.bus_ids - chunk % self.bus_ids) % self.bus_ids
+            best = np.argmin(waits, axis=1)
+            bus_positions[start:start + len(best)] = best
+            wait_times[start:start + len(best)] = waits[np.arange(len(best)), best]
+        return (bus_positions, wait_times)
+
+    def query(self, timestamps):
+        """
+        Returns (bus_ids, wait_times) arrays, one entry per timestamp.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if self.table is not None:
+            bus_positions, wait_times = self.table
+            slots = timestamps % self.window
+            return (self.bus_ids[bus_positions[slots]], wait_times[slots])
+
+        bus_positions, wait_times = self._compute(timestamps)
+        return (self.bus_ids[bus_positions], wait_times)
+
 """
 The shuttle company is running a contest: one gold coin for anyone that can find the earliest timestamp such that the first bus ID departs at that time and each subsequent listed bus ID departs at that subsequent minute. (The first line in your input is no longer relevant.)
 
@@ -62,6 +111,42 @@ def find_first_timestamp_matching_offsets(lines):
         if busses_matched == len(busses):
             return timestamp
 
+def parse_bus_offsets(schedule_line):
+    return [(offset, int(bus)) for offset, bus in enumerate(schedule_line.split(',')) if bus != 'x']
+
+def combine_congruences(congruence_1, congruence_2):
+    """
+    Merges t = a1 (mod m1) and t = a2 (mod m2) into a single t = a (mod lcm(m1, m2)).
+    The moduli don't need to be coprime; returns None when the two can't both hold.
+    """
+    a1, m1 = congruence_1
+    a2, m2 = congruence_2
+    g = gcd(m1, m2)
+    if (a2 - a1) % g != 0:
+        return None
+
+    m2_reduced = m2 // g
+    k = ((a2 - a1) // g * pow(m1 // g, -1, m2_reduced)) % m2_reduced
+    lcm = m1 * m2_reduced
+    return ((a1 + m1 * k) % lcm, lcm)
+
+def solve_bus_offsets(bus_offsets):
+    """
+    Earliest timestamp t >= 0 at which each bus departs at t + offset, found by folding the
+    constraints t = -offset (mod bus_id) together one at a time. Returns None if no such
+    timestamp exists.
+    """
+    congruence = (0, 1)
+    for offset, bus in bus_offsets:
+        congruence = combine_congruences(congruence, (-offset % bus, bus))
+        if congruence is None:
+            return None
+
+    return congruence[0]
+
+def find_earliest_timestamp_matching_offsets(lines):
+    return solve_bus_offsets(parse_bus_offsets(lines[1]))
+
 def main():
     with open('day13.txt') as f:
         lines = [line.strip() for line in f.readlines()]
@@ -69,7 +154,7 @@ def main():
     result = find_first_bus(lines)
     print(result[0] * result[1])
 
-    result = find_first_timestamp_matching_offsets(lines)
+    result = find_earliest_timestamp_matching_offsets(lines)
     print(result)
 
 if __name__ == '__main__':